@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+
+import sys, io, os, json, time, argparse, resource, subprocess, tracemalloc
+from collections import OrderedDict
+
+from wtu.table import Table
+from wtu.synthetic import SyntheticCorpus, column_types
+from wtu.task.literalnormalization import LiteralNormalization
+from wtu.task.entitylinking import EntityLinking
+from wtu.task.languagedetection import LanguageDetection
+from wtu.task.literallinking import LiteralLinking
+from wtu.task.classlinking import ClassLinking
+from index import builders
+
+# tasks in pipeline order
+tasks_available = OrderedDict(
+    (task_cls.__name__, task_cls)
+    for task_cls in [LanguageDetection, LiteralNormalization, EntityLinking, LiteralLinking, ClassLinking]
+)
+
+# utility function (print message to STDERR and exit)
+def die(message, return_code=1):
+    print(message, file=sys.stderr)
+    sys.exit(return_code)
+
+# utility function (print message to STDERR)
+def info(message):
+    print(message, file=sys.stderr)
+
+# call `func' and measure its wall time and (optionally) its peak memory
+# allocation. Returns the result, wall time (s) and peak memory (bytes)
+def measure(func, memory=False):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        res = func()
+    finally:
+        wall_time = time.perf_counter() - start
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return res, wall_time, peak
+
+def read_lines(file_name):
+    with io.open(file_name, 'r', encoding='utf-8') as fh:
+        return fh.readlines()
+
+def load_tables(lines):
+    return [Table(json.loads(line)) for line in lines]
+
+def n_cells(lines):
+    return sum(
+        len(table_data['relation']) * len(table_data['relation'][0])
+        for table_data in map(json.loads, lines)
+    )
+
+def mb(n_bytes):
+    return None if n_bytes is None else n_bytes / 2**20
+
+# the backend configurations available for a task, building the binary/mmap
+# index files from the TSV index if necessary
+def backend_configs(task_name, data_dir, files):
+    task_cls = tasks_available[task_name]
+    if not hasattr(task_cls, 'backends_available'):
+        return [None]
+
+    configs = []
+    for backend_name in task_cls.backends_available:
+        if backend_name == 'csv':
+            configs.append(['csv', {'index_file': files[task_name]}])
+        elif (task_name, backend_name) in builders:
+            index_file = os.path.join(data_dir, '{:s}.{:s}'.format(task_name, backend_name))
+            if not os.path.exists(index_file):
+                builders[(task_name, backend_name)](files[task_name], index_file)
+            configs.append([backend_name, {'index_file': index_file}])
+    return configs
+
+def task_args(task_name, backend):
+    args = {}
+    if backend is not None:
+        args['backend'] = backend
+    return args
+
+# generate synthetic tables and indexes
+def generate(args):
+    corpus = SyntheticCorpus(
+        n_entities=args.entities,
+        n_extra_properties=args.extra_properties,
+        ambiguity=args.ambiguity,
+        seed=args.seed,
+    )
+    tables = corpus.tables(
+        args.tables, args.rows, args.cols,
+        types=args.types.split(','),
+        duplicate_rate=args.duplicate_rate,
+        match_rate=args.match_rate,
+    )
+    files = corpus.write(args.data_dir, tables)
+
+    # wtu.py configuration using the CSV backends
+    config = {
+        'tasks': [
+            ['LiteralNormalization'],
+            ['EntityLinking', {'backend': ['csv', {'index_file': files['EntityLinking']}]}],
+            ['LiteralLinking', {'backend': ['csv', {'index_file': files['LiteralLinking']}]}],
+            ['ClassLinking', {'backend': ['csv', {'index_file': files['ClassLinking']}]}],
+        ]
+    }
+    with io.open(os.path.join(args.data_dir, 'config.json'), 'w') as config_fh:
+        json.dump(config, config_fh, indent=2)
+
+    info('Wrote synthetic data to "{:s}"'.format(args.data_dir))
+
+# iterate over all cells of the tables via cells(), rows() and columns(),
+# `args.passes' times per table (like the tasks of a pipeline do)
+def bench_table_iteration(lines, args):
+    results = []
+    cells = n_cells(lines) * args.passes
+
+    def iter_cells(tables):
+        for table in tables:
+            for _ in range(args.passes):
+                for cell in table.cells():
+                    cell.content, cell.annotations
+
+    def iter_rows(tables):
+        for table in tables:
+            for _ in range(args.passes):
+                for row in table.rows():
+                    row.annotations
+                    for cell in row:
+                        cell.content, cell.annotations
+
+    def iter_columns(tables):
+        for table in tables:
+            for _ in range(args.passes):
+                for column in table.columns():
+                    column.annotations
+                    for cell in column:
+                        cell.content, cell.annotations
+
+    for name, iterate in [('cells', iter_cells), ('rows', iter_rows), ('columns', iter_columns)]:
+        best = None
+        for _ in range(args.repeat):
+            tables = load_tables(lines)
+            _, wall_time, _ = measure(lambda: iterate(tables))
+            best = wall_time if best is None else min(best, wall_time)
+
+        tables = load_tables(lines)
+        _, _, peak = measure(lambda: iterate(tables), memory=args.memory)
+
+        results.append(OrderedDict([
+            ('benchmark', 'Table.{:s}()'.format(name)),
+            ('wall_time', best),
+            ('cells_per_second', cells / best),
+            ('peak_mb', mb(peak)),
+        ]))
+
+    return results
+
+# run each task (with each of its backends) on the output of the previous tasks
+def bench_tasks(lines, args, files):
+    results = []
+    cells = n_cells(lines)
+
+    for task_name in tasks_available:
+        if args.tasks and task_name not in args.tasks:
+            continue
+
+        next_lines = None
+        for backend in backend_configs(task_name, args.data_dir, files):
+            name = task_name if backend is None else '{:s}[{:s}]'.format(task_name, backend[0])
+            try:
+                task, load_time, load_peak = measure(
+                    lambda: tasks_available[task_name](**task_args(task_name, backend)),
+                    memory=args.memory
+                )
+
+                best = None
+                for _ in range(args.repeat):
+                    tables = load_tables(lines)
+                    _, wall_time, _ = measure(lambda: [task.run(table) for table in tables])
+                    best = wall_time if best is None else min(best, wall_time)
+
+                tables = load_tables(lines)
+                _, _, peak = measure(lambda: [task.run(table) for table in tables], memory=args.memory)
+            except LookupError as e:
+                # e.g. missing nltk corpora
+                reason = [line.strip() for line in str(e).split('\n') if line.strip('* ')]
+                info('Skipping {:s}: {:s}'.format(name, reason[0] if reason else ''))
+                break
+
+            results.append(OrderedDict([
+                ('benchmark', name),
+                ('load_time', load_time),
+                ('load_peak_mb', mb(load_peak)),
+                ('wall_time', best),
+                ('tables_per_second', len(lines) / best),
+                ('cells_per_second', cells / best),
+                ('peak_mb', mb(peak)),
+            ]))
+
+            if next_lines is None:
+                next_lines = [json.dumps(table.dump()) for table in tables]
+
+        # the next task works on this task's output
+        if next_lines is not None:
+            lines = next_lines
+
+    return results
+
+# compare LiteralLinking's sampling mode (see `LiteralLinking.sample') with
+# the exhaustive mode: wall time and precision/recall of the sampled
+# LiteralLinking annotations against the exhaustive ones
+def bench_sampling(lines, args, files):
+    results = []
+    cells = n_cells(lines)
+
+    # LiteralLinking works on the output of LiteralNormalization and EntityLinking
+    tables = load_tables(lines)
+    for task in [LiteralNormalization(), EntityLinking(backend=['csv', {'index_file': files['EntityLinking']}])]:
+        for table in tables:
+            task.run(table)
+    lines = [json.dumps(table.dump()) for table in tables]
+
+    def ll_annotations(tables):
+        return set(
+            (table_idx, cell.idx, anno['references_el'], anno['references_ln'], anno['property_uri'])
+            for table_idx, table in enumerate(tables)
+            for cell in table.cells()
+            for anno in cell.annotations
+            if anno.get('task') == 'LiteralLinking'
+        )
+
+    reference = None
+    for name, sample in [('exhaustive', None), ('sampled', [args.sample_rows, args.sample_threshold])]:
+        task = LiteralLinking(backend=['csv', {'index_file': files['LiteralLinking']}], sample=sample)
+
+        best = None
+        for _ in range(args.repeat):
+            tables = load_tables(lines)
+            _, wall_time, _ = measure(lambda: [task.run(table) for table in tables])
+            best = wall_time if best is None else min(best, wall_time)
+
+        annotations = ll_annotations(tables)
+        if reference is None:
+            reference = annotations
+        found = len(annotations & reference)
+
+        results.append(OrderedDict([
+            ('benchmark', 'LiteralLinking ({:s})'.format(name)),
+            ('wall_time', best),
+            ('cells_per_second', cells / best),
+            ('annotations', len(annotations)),
+            ('precision', found / len(annotations) if annotations else 1.0),
+            ('recall', found / len(reference) if reference else 1.0),
+        ]))
+
+    return results
+
+# run the full wtu.py pipeline on the generated tables
+def bench_pipeline(lines, args, files):
+    with io.open(os.path.join(args.data_dir, 'config.json'), 'r') as config_fh:
+        config = json.load(config_fh)
+    config['n_processes'] = args.processes
+    config_file = os.path.join(args.data_dir, 'config.benchmark.json')
+    with io.open(config_file, 'w') as config_fh:
+        json.dump(config, config_fh)
+
+    wtu_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wtu.py')
+    with io.open(files['tables'], 'rb') as in_fh, io.open(os.devnull, 'wb') as out_fh:
+        _, wall_time, _ = measure(lambda: subprocess.run(
+            [sys.executable, wtu_py, config_file], stdin=in_fh, stdout=out_fh, check=True
+        ))
+
+    # peak resident set size of the largest child process (KiB on linux)
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+    return [OrderedDict([
+        ('benchmark', 'wtu.py (n_processes={:d})'.format(args.processes)),
+        ('wall_time', wall_time),
+        ('tables_per_second', len(lines) / wall_time),
+        ('cells_per_second', n_cells(lines) / wall_time),
+        ('peak_mb', mb(max_rss)),
+    ])]
+
+benchmarks = OrderedDict([
+    ('table', lambda lines, args, files: bench_table_iteration(lines, args)),
+    ('tasks', bench_tasks),
+    ('sampling', bench_sampling),
+    ('pipeline', bench_pipeline),
+])
+
+def run(args):
+    files = {
+        'tables': os.path.join(args.data_dir, 'tables.json'),
+        'EntityLinking': os.path.join(args.data_dir, 'entity_linking.csv'),
+        'LiteralLinking': os.path.join(args.data_dir, 'literal_linking.csv'),
+        'ClassLinking': os.path.join(args.data_dir, 'class_linking.csv'),
+    }
+    if not os.path.exists(files['tables']):
+        die('No synthetic data in "{:s}". Run "{:s} generate" first!'.format(args.data_dir, sys.argv[0]))
+    lines = read_lines(files['tables'])
+
+    results = []
+    for benchmark_name in args.benchmarks.split(','):
+        for result in benchmarks[benchmark_name](lines, args, files):
+            print('  '.join(
+                '{!s}'.format(value) if key == 'benchmark' else
+                '{:s}={:.4g}'.format(key, value) if isinstance(value, float) else
+                '{:s}={!s}'.format(key, value)
+                for key, value in result.items()
+                if value is not None
+            ))
+            results.append(result)
+
+    if args.json:
+        with io.open(args.json, 'w') as json_fh:
+            json.dump(results, json_fh, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark WTU on synthetic tables.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    gen_parser = subparsers.add_parser('generate', help='generate synthetic tables and indexes')
+    gen_parser.add_argument('data_dir')
+    gen_parser.add_argument('--tables', type=int, default=100)
+    gen_parser.add_argument('--rows', type=int, default=40)
+    gen_parser.add_argument('--cols', type=int, default=6)
+    gen_parser.add_argument('--types', default=','.join(column_types),
+        help='comma separated column types ({:s})'.format(', '.join(column_types)))
+    gen_parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    gen_parser.add_argument('--match-rate', type=float, default=0.8)
+    gen_parser.add_argument('--entities', type=int, default=5000)
+    gen_parser.add_argument('--extra-properties', type=int, default=5)
+    gen_parser.add_argument('--ambiguity', type=float, default=0.2)
+    gen_parser.add_argument('--seed', type=int, default=0)
+
+    run_parser = subparsers.add_parser('run', help='run benchmarks on generated data')
+    run_parser.add_argument('data_dir')
+    run_parser.add_argument('--benchmarks', default=','.join(benchmarks),
+        help='comma separated benchmarks ({:s})'.format(', '.join(benchmarks)))
+    run_parser.add_argument('--tasks', nargs='*', help='only benchmark these tasks')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--passes', type=int, default=4, help='passes over each table (table benchmark)')
+    run_parser.add_argument('--sample-rows', type=int, default=10, help='LiteralLinking sample size (sampling benchmark)')
+    run_parser.add_argument('--sample-threshold', type=float, default=0.2, help='LiteralLinking sample threshold (sampling benchmark)')
+    run_parser.add_argument('--memory', action='store_true', help='measure peak memory (tracemalloc)')
+    run_parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument('--json', help='write results to this file')
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        generate(args)
+    elif args.command == 'run':
+        run(args)
+    else:
+        parser.print_help()
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        die('Keyboard Interrupt!')
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import sys
+
+from wtu.task.entitylinking import EntityLinkingBackendBinary, EntityLinkingBackendMMap, EntityLinkingBackendSQLite
+from wtu.task.literallinking import LiteralLinkingBackendBinary, LiteralLinkingBackendSQLite
+from wtu.task.classlinking import ClassLinkingBackendBinary
+
+# utility function (print message to STDERR and exit)
+def die(message, return_code=1):
+    print(message, file=sys.stderr)
+    sys.exit(return_code)
+
+# index builders by task and backend name
+builders = {
+    ('EntityLinking', 'binary'): EntityLinkingBackendBinary.build,
+    ('EntityLinking', 'mmap'): EntityLinkingBackendMMap.build,
+    ('EntityLinking', 'sqlite'): EntityLinkingBackendSQLite.build,
+    ('LiteralLinking', 'binary'): LiteralLinkingBackendBinary.build,
+    ('LiteralLinking', 'sqlite'): LiteralLinkingBackendSQLite.build,
+    ('ClassLinking', 'binary'): ClassLinkingBackendBinary.build,
+}
+
+def usage():
+    die('\n'.join([
+        'usage: {:s} build <task> <backend> <TSV index file> <output file>'.format(sys.argv[0]),
+        '',
+        'Convert a TSV index file to the index format of <backend>.',
+        'Supported <task> <backend> combinations:',
+        *(
+            '    {:s} {:s}'.format(task_name, backend_name)
+            for task_name, backend_name in builders
+        ),
+    ]))
+
+def main():
+    if len(sys.argv) != 6 or sys.argv[1] != 'build':
+        usage()
+
+    task_name, backend_name, index_file, output_file = sys.argv[2:]
+    if (task_name, backend_name) not in builders:
+        usage()
+
+    builders[(task_name, backend_name)](index_file, output_file)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        die('Keyboard Interrupt!')
@@ -1,12 +1,16 @@
 #!/usr/bin/env python
 
-import sys, io, os
+import sys, io, os, stat, argparse
 from itertools import islice
 from multiprocessing import Pool
-import json
+from threading import Semaphore
+import json, time, random, cProfile
 from json.decoder import JSONDecodeError
 
 from wtu.table import Table
+from wtu.corpus import CorpusWriter, list_input_files
+from wtu.stats import StatsCollector
+from wtu.journal import Journal
 from wtu.task.literalnormalization import LiteralNormalization
 from wtu.task.entitylinking import EntityLinking
 from wtu.task.languagedetection import LanguageDetection
@@ -18,16 +22,44 @@ def die(message, return_code=1):
     print(message, file=sys.stderr)
     sys.exit(return_code)
 
-def read_chunks(fh, chunk_size):
-    while True:
-        lines = list(islice(fh, chunk_size))
-        if not lines:
-            break
-        yield lines
+# utility function (print message to STDERR)
+def info(message):
+    print(message, file=sys.stderr)
+
+# apply `func' to all `items' using the worker `pool' and yield the results as
+# soon as they are available. At most `window_size' items are in flight at any
+# time (submitted but not yet consumed), which bounds memory usage without
+# making the workers wait for the slowest item of a chunk. If `ordered' is set,
+# results are yielded in input order (buffering at most `window_size' results),
+# otherwise in order of completion.
+def process_stream(pool, func, items, window_size, ordered=True):
+    in_flight = Semaphore(window_size)
+    stopped = False
+
+    # feeds `items' to the pool, blocks while the window is full
+    def throttled_items():
+        for item in items:
+            in_flight.acquire()
+            if stopped:
+                return
+            yield item
+
+    imap = pool.imap if ordered else pool.imap_unordered
+    try:
+        for result in imap(func, throttled_items()):
+            in_flight.release()
+            yield result
+    finally:
+        # unblock the pool's feeder thread if we stopped early
+        stopped = True
+        for _ in range(window_size):
+            in_flight.release()
 
 def process_line(json_line):
     try:
+        start = time.perf_counter()
         table_data = json.loads(json_line)
+        json_load_time = time.perf_counter() - start
 
         # create Table object from 'relation' field
         if 'relation' in table_data and len(table_data['relation']) > 0:
@@ -35,27 +67,171 @@ def process_line(json_line):
             table = Table(table_data)
 
             # run scheduled tasks
+            # (instrumented, if stats are to be collected)
+            table_stats, profile_stats = None, None
+            if stats_config is not None:
+                table_stats = {
+                    'cols': table.num_cols,
+                    'rows': table.num_rows,
+                    'output': False,
+                    'json_load': json_load_time,
+                    'json_dump': 0.0,
+                    'tasks': {},
+                }
+
             for task in tasks_scheduled:
-                if not task.run(table):
-                    return None
+                if table_stats is None:
+                    task_res = task.run(table)
+                else:
+                    task_name = type(task).__name__
+
+                    # profile a sample of the chosen task's runs
+                    profiler = None
+                    if task_name == profile_config.get('task') and random.random() < profile_config.get('sample_rate', 1):
+                        profiler = cProfile.Profile()
+                        profiler.enable()
+
+                    task_res, table_stats['tasks'][task_name] = task.run_instrumented(table)
+
+                    if profiler is not None:
+                        profiler.disable()
+                        profiler.create_stats()
+                        profile_stats = profiler.stats
+
+                if not task_res:
+                    return None, table_stats, profile_stats
             else:
                 # output annotated table as json
-                return json.dumps(table.dump())
+                start = time.perf_counter()
+                output_line = json.dumps(table.dump())
+                if table_stats is not None:
+                    table_stats['json_dump'] = time.perf_counter() - start
+                    table_stats['output'] = True
+                return output_line, table_stats, profile_stats
         else:
-            return None
+            return None, None, None
 
     # ignore JSON decoding errors
     except JSONDecodeError:
-        return None
+        return None, None, None
+
+# process_line for lines tagged with the index of their input file
+def process_tagged_line(tagged_line):
+    file_idx, json_line = tagged_line
+    return file_idx, process_line(json_line)
+
+# process all input files in `in_dir' and write the results to one gzipped
+# output file per input file in `out_dir'. All files are streamed through the
+# same worker pool, so there are no pauses between files. Input files are
+# decompressed by the pool's feeder thread and output files are compressed by
+# the main thread while the workers are busy annotating tables.
+def process_dir(pool, in_dir, out_dir, window_size, ordered, stats, journal, resume_state):
+    input_files, skipped_files = list_input_files(in_dir)
+    for file_path in skipped_files:
+        info('Skipping "{:s}". Unknown file type.'.format(file_path))
+
+    writer = CorpusWriter(input_files, out_dir, state=resume_state)
+    info('Processing {:d} files from "{:s}"...'.format(len(input_files), in_dir))
+
+    def checkpoint():
+        journal.save({
+            'mode': 'directory',
+            **writer.checkpoint(),
+        })
+
+    tagged_lines = process_stream(pool, process_tagged_line, writer.read(), window_size, ordered)
+    for file_idx, (line, table_stats, profile_stats) in tagged_lines:
+        if table_stats is not None:
+            stats.add(table_stats, profile_stats)
+        for completed_idx in writer.write(file_idx, line):
+            info('Done IN:"{:s}" -> OUT:"{:s}"'.format(
+                input_files[completed_idx], writer.output_path(completed_idx)
+            ))
+        if journal is not None and journal.due():
+            checkpoint()
+    for completed_idx in writer.close_all():
+        info('Done IN:"{:s}" -> OUT:"{:s}"'.format(
+            input_files[completed_idx], writer.output_path(completed_idx)
+        ))
+    if journal is not None:
+        checkpoint()
+
+# size of the regular file STDOUT is redirected to (None for pipes, terminals...)
+def stdout_size():
+    stdout_stat = os.fstat(sys.stdout.fileno())
+    if stat.S_ISREG(stdout_stat.st_mode):
+        return stdout_stat.st_size
+    return None
+
+# process tables from STDIN and write the results to STDOUT
+def process_stdin(pool, window_size, ordered, stats, journal, resume_state):
+    n_input_lines, n_tables = 0, 0
+
+    # skip input that has already been processed by a previous run
+    # and discard output written after its last checkpoint
+    if resume_state is not None:
+        n_input_lines, n_tables = resume_state['input_lines'], resume_state['tables']
+        output_bytes = resume_state['output_bytes']
+        if output_bytes is not None:
+            current_size = stdout_size()
+            if current_size is None or current_size < output_bytes:
+                die('Can not resume: STDOUT must be appended (>>) to the previous run\'s output file!')
+            os.ftruncate(sys.stdout.fileno(), output_bytes)
+            os.lseek(sys.stdout.fileno(), 0, os.SEEK_END)
+
+    def checkpoint():
+        sys.stdout.flush()
+        journal.save({
+            'mode': 'stdin',
+            'input_lines': n_input_lines,
+            'tables': n_tables,
+            'output_bytes': stdout_size(),
+        })
+
+    # input data encoding is broken (utf-8 with the occasional latin-1 thrown in)
+    # -> ignore encoding errors
+    with io.open(sys.stdin.fileno(), 'r', encoding='utf-8', errors='ignore') as stdin:
+        # read JSON data line-by-line
+        lines = islice(stdin, n_input_lines, None)
+        results = process_stream(pool, process_line, lines, window_size, ordered)
+        for line, table_stats, profile_stats in results:
+            if table_stats is not None:
+                stats.add(table_stats, profile_stats)
+            if line is not None:
+                print(line)
+                n_tables += 1
+            n_input_lines += 1
+            if journal is not None and journal.due():
+                checkpoint()
+
+    if journal is not None:
+        checkpoint()
 
 def main():
-    # we need at least one command line argument
-    if len(sys.argv) < 2:
-        die('usage: {:s} <config file>'.format(sys.argv[0]))
+    parser = argparse.ArgumentParser(
+        description='''Read tables from STDIN and write the annotated tables to STDOUT or
+            read all files from <input dir> and write the annotated tables to
+            one gzipped file per input file in <output dir>.'''
+    )
+    parser.add_argument('config_file', metavar='<config file>')
+    parser.add_argument('in_dir', metavar='<input dir>', nargs='?')
+    parser.add_argument('out_dir', metavar='<output dir>', nargs='?')
+    parser.add_argument('--journal', metavar='<journal file>',
+        help='record progress in this file (requires ordered output)')
+    parser.add_argument('--journal-interval', metavar='<seconds>', type=float, default=60,
+        help='how often to record progress (default: 60)')
+    parser.add_argument('--resume', action='store_true',
+        help='resume the run recorded in the journal file')
+    args = parser.parse_args()
+
+    if (args.in_dir is None) != (args.out_dir is None):
+        parser.error('either both or none of <input dir> <output dir> are required')
+    if args.resume and args.journal is None:
+        parser.error('--resume requires --journal')
 
     # get config file name from command line arguments
     # and prepare `config'
-    config_file_name = sys.argv[1]
+    config_file_name = args.config_file
     config = {}
 
     # read JSON formatted configuration from the config file
@@ -97,24 +273,75 @@ def main():
     if 'n_processes' in config:
         n_processes = config['n_processes']
 
-    # number of input lines to hold in memory at any time
+    # number of input lines in flight (read, but not yet written) at any time
     # defaults to ten per processes
-    # can be overridden using the config files 'chunk_size' key
-    chunk_size = 10 * n_processes
-    if 'chunk_size' in config:
-        chunk_size = config['chunk_size']
+    # can be overridden using the config files 'window_size' key
+    # ('chunk_size' is still accepted for backwards compatibility)
+    window_size = 10 * n_processes
+    if 'window_size' in config:
+        window_size = config['window_size']
+    elif 'chunk_size' in config:
+        window_size = config['chunk_size']
 
-    # start processing JSON from STDIN
+    # output tables in input order (default) or as soon as they are done
+    # can be overridden using the config file's 'ordered' key
+    ordered = True
+    if 'ordered' in config:
+        ordered = config['ordered']
+
+    # collect per-task runtime stats and write them to a JSON report
+    # enabled using the config file's 'stats' key, e.g.
+    # "stats": {
+    #     "file": "stats.json",
+    #     "per_table": false,
+    #     "profile": {"task": "EntityLinking", "sample_rate": 0.01, "file": "el.prof"}
+    # }
+    global stats_config, profile_config
+    stats_config = config.get('stats')
+    profile_config = {}
+    stats = None
+    if stats_config is not None:
+        if 'file' not in stats_config:
+            die('Missing "file" in "stats" configuration!')
+        profile_config = stats_config.get('profile', {})
+        stats = StatsCollector(per_table=stats_config.get('per_table', False))
+
+    # check input and output directories
+    corpus_mode = args.in_dir is not None
+    if corpus_mode:
+        in_dir, out_dir = args.in_dir, args.out_dir
+        if not os.path.isdir(in_dir):
+            die('Invalid input directory "{:s}"!'.format(in_dir))
+        if os.path.exists(out_dir) and os.path.samefile(in_dir, out_dir):
+            die('Input directory and output directory can not be the same!')
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+        except OSError:
+            die('Could not create output directory "{:s}"!'.format(out_dir))
+
+    # record progress in a journal file, resume from it if requested
+    journal, resume_state = None, None
+    if args.journal is not None:
+        if not ordered:
+            die('Journaling requires ordered output!')
+        journal = Journal(args.journal, args.journal_interval)
+        if args.resume:
+            resume_state = journal.load()
+            if resume_state is None:
+                info('No journal "{:s}" found. Starting from scratch.'.format(args.journal))
+            elif resume_state['mode'] != ('directory' if corpus_mode else 'stdin'):
+                die('Journal "{:s}" belongs to a different kind of run!'.format(args.journal))
+
+    # start processing JSON from STDIN (or the input directory)
     # using a pool of worker processes
     with Pool(processes=n_processes) as pool:
-        # input data encoding is broken (utf-8 with the occasional latin-1 thrown in)
-        # -> ignore encoding errors
-        with io.open(sys.stdin.fileno(), 'r', encoding='utf-8', errors='ignore') as stdin:
-            # read JSON data line-by-line
-            for chunk in read_chunks(stdin, chunk_size):
-                for line in pool.map(process_line, chunk):
-                    if line is not None:
-                        print(line)
+        if corpus_mode:
+            process_dir(pool, in_dir, out_dir, window_size, ordered, stats, journal, resume_state)
+        else:
+            process_stdin(pool, window_size, ordered, stats, journal, resume_state)
+
+    if stats is not None:
+        stats.write(stats_config['file'], profile_config.get('file'))
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,240 @@
+import io, os, sys, gzip, zlib, tarfile
+from itertools import islice
+from threading import Lock
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+
+# utility function (print message to STDERR)
+def info(message: str) -> None:
+    print(message, file=sys.stderr)
+
+# errors reading broken (e.g. truncated) input files
+read_errors = (tarfile.TarError, OSError, EOFError, zlib.error)
+
+# supported input file extensions
+input_extensions = ['.tar.gz', '.json.gz', '.json']
+
+def input_extension(file_name: str) -> str:
+    for extension in input_extensions:
+        if file_name.endswith(extension):
+            return extension
+    return None
+
+# output file name for an input file name, e.g. 'foo.tar.gz' -> 'foo.json.gz'
+def output_file_name(file_name: str) -> str:
+    extension = input_extension(file_name)
+    return file_name[:-len(extension)] + '.json.gz'
+
+# list all input files in `in_dir' (sorted by name),
+# returns the list of input files and the list of skipped files
+def list_input_files(in_dir: str) -> Tuple[List[str], List[str]]:
+    input_files, skipped_files = [], []
+    for file_name in sorted(os.listdir(in_dir)):
+        file_path = os.path.join(in_dir, file_name)
+        if not os.path.isfile(file_path):
+            continue
+        if input_extension(file_name) is None:
+            skipped_files.append(file_path)
+        else:
+            input_files.append(file_path)
+
+    return input_files, skipped_files
+
+# input data encoding is broken (utf-8 with the occasional latin-1 thrown in)
+# -> ignore encoding errors
+def text_lines(binary_fh: IO[bytes]) -> Iterator[str]:
+    for line in binary_fh:
+        yield line.decode('utf-8', errors='ignore')
+
+# read all lines of an input file
+#
+# *.json:    plain JSON lines
+# *.json.gz: gzipped JSON lines
+# *.tar.gz:  gzipped tar archive of (gzipped) JSON line files (WDC corpus)
+def read_input_file(file_path: str) -> Iterator[str]:
+    extension = input_extension(file_path)
+
+    if extension == '.tar.gz':
+        # stream the archive, its members are read in order
+        with tarfile.open(file_path, 'r|gz') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                # members are usually gzipped as well (check gzip magic number)
+                member_fh = tar.extractfile(member)
+                if member_fh.peek(2)[:2] == b'\x1f\x8b':
+                    member_fh = gzip.GzipFile(fileobj=member_fh)
+                yield from text_lines(member_fh)
+
+    elif extension == '.json.gz':
+        with gzip.open(file_path, 'rb') as in_fh:
+            yield from text_lines(in_fh)
+
+    elif extension == '.json':
+        with io.open(file_path, 'rb') as in_fh:
+            yield from text_lines(in_fh)
+
+# Writes the results of processing a directory of input files to one gzipped
+# output file per input file.
+#
+# Input lines are tagged with the index of the file they were read from (see
+# `read'). Results may arrive in any order, output files are opened on the
+# first result and closed as soon as all lines of their input file have been
+# read and all of their results have been written.
+#
+# For checkpointing (see `checkpoint' and wtu/journal.py) the output is
+# written as a series of gzip members, one per checkpoint. A run can be
+# resumed from a checkpoint's `state': completed files are skipped, partially
+# processed files are truncated to their last checkpoint and appended to.
+class CorpusWriter:
+    def __init__(self, input_files: List[str], out_dir: str, compresslevel: int=6, state: Optional[Dict]=None) -> None:
+        self.input_files = input_files
+        self.out_dir = out_dir
+        self.compresslevel = compresslevel
+
+        self.lock = Lock()
+        self.n_read = [0] * len(input_files)
+        self.n_written = [0] * len(input_files)
+        self.read_done = [False] * len(input_files)
+        self.closed = [False] * len(input_files)
+        self.raw_fhs = {} # type: Dict[int, IO[bytes]]
+        self.gzip_fhs = {} # type: Dict[int, gzip.GzipFile]
+
+        # progress of a previous run
+        self.n_skip = [0] * len(input_files)
+        self.n_tables = [0] * len(input_files)
+        self.output_bytes = [None] * len(input_files) # type: List[Optional[int]]
+        if state is not None:
+            self.restore(state)
+
+    def file_name(self, file_idx: int) -> str:
+        return os.path.basename(self.input_files[file_idx])
+
+    def output_path(self, file_idx: int) -> str:
+        return os.path.join(self.out_dir, output_file_name(self.file_name(file_idx)))
+
+    # yield (file index, line) for all lines of all input files. Broken input
+    # files are skipped (after the lines that could be read)
+    def read(self) -> Iterator[Tuple[int, str]]:
+        for file_idx, file_path in enumerate(self.input_files):
+            if self.closed[file_idx]:
+                continue
+            lines = islice(read_input_file(file_path), self.n_skip[file_idx], None)
+            try:
+                for line in lines:
+                    with self.lock:
+                        self.n_read[file_idx] += 1
+                    yield file_idx, line
+            except read_errors as e:
+                info('Skipping "{:s}": {!s}'.format(file_path, e))
+            with self.lock:
+                self.read_done[file_idx] = True
+
+    def open(self, file_idx: int) -> gzip.GzipFile:
+        if file_idx not in self.raw_fhs:
+            output_path = self.output_path(file_idx)
+            if self.output_bytes[file_idx] is None:
+                raw_fh = io.open(output_path, 'wb')
+            else:
+                # discard output written after the last checkpoint
+                raw_fh = io.open(output_path, 'r+b')
+                raw_fh.truncate(self.output_bytes[file_idx])
+                raw_fh.seek(0, io.SEEK_END)
+            self.raw_fhs[file_idx] = raw_fh
+
+        # start a new gzip member
+        if file_idx not in self.gzip_fhs:
+            self.gzip_fhs[file_idx] = gzip.GzipFile(
+                fileobj=self.raw_fhs[file_idx], mode='wb', compresslevel=self.compresslevel
+            )
+
+        return self.gzip_fhs[file_idx]
+
+    # finish the current gzip member and flush the output file to disk
+    def sync(self, file_idx: int) -> None:
+        if file_idx in self.gzip_fhs:
+            self.gzip_fhs.pop(file_idx).close()
+        raw_fh = self.raw_fhs[file_idx]
+        raw_fh.flush()
+        os.fsync(raw_fh.fileno())
+
+    def close(self, file_idx: int) -> None:
+        # e.g. empty input files: write an empty gzip member
+        if file_idx not in self.raw_fhs:
+            self.open(file_idx)
+        self.sync(file_idx)
+        self.raw_fhs.pop(file_idx).close()
+        self.closed[file_idx] = True
+
+    # write the result for one line of file `file_idx' (`None': no output)
+    # returns the indices of the files that were completed
+    def write(self, file_idx: int, line: str) -> List[int]:
+        out_fh = self.open(file_idx)
+        if line is not None:
+            out_fh.write(line.encode('utf-8'))
+            out_fh.write(b'\n')
+            self.n_tables[file_idx] += 1
+        self.n_written[file_idx] += 1
+
+        completed = []
+        with self.lock:
+            for open_idx in list(self.raw_fhs):
+                if self.read_done[open_idx] and self.n_written[open_idx] == self.n_read[open_idx]:
+                    completed.append(open_idx)
+        for completed_idx in completed:
+            self.close(completed_idx)
+
+        return completed
+
+    # close all remaining output files, including those of empty input files
+    # returns the indices of the files that were completed
+    def close_all(self) -> List[int]:
+        completed = [
+            file_idx
+            for file_idx in range(len(self.input_files))
+            if not self.closed[file_idx]
+        ]
+        for file_idx in completed:
+            self.close(file_idx)
+
+        return completed
+
+    # commit everything written so far to disk and return the current state.
+    # Only valid if results are written in input order
+    def checkpoint(self) -> Dict:
+        partial = {}
+        for file_idx in range(len(self.input_files)):
+            if self.closed[file_idx]:
+                continue
+            if file_idx in self.raw_fhs:
+                self.sync(file_idx)
+                self.output_bytes[file_idx] = self.raw_fhs[file_idx].tell()
+            if self.output_bytes[file_idx] is not None:
+                partial[self.file_name(file_idx)] = {
+                    'input_lines': self.n_skip[file_idx] + self.n_written[file_idx],
+                    'tables': self.n_tables[file_idx],
+                    'output_bytes': self.output_bytes[file_idx],
+                }
+
+        return {
+            'completed': [
+                self.file_name(file_idx)
+                for file_idx in range(len(self.input_files))
+                if self.closed[file_idx]
+            ],
+            'partial': partial,
+        }
+
+    def restore(self, state: Dict) -> None:
+        file_idxs = {
+            self.file_name(file_idx): file_idx
+            for file_idx in range(len(self.input_files))
+        }
+        for file_name in state['completed']:
+            if file_name in file_idxs:
+                self.closed[file_idxs[file_name]] = True
+        for file_name, file_state in state['partial'].items():
+            if file_name in file_idxs:
+                file_idx = file_idxs[file_name]
+                self.n_skip[file_idx] = file_state['input_lines']
+                self.n_tables[file_idx] = file_state['tables']
+                self.output_bytes[file_idx] = file_state['output_bytes']
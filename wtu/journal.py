@@ -0,0 +1,38 @@
+import io, os, json, time
+from typing import Dict, Optional
+
+# Progress journal for long runs of wtu.py
+#
+# Records how much of the input has been processed and committed to the
+# output (number of input lines, number of tables written and the size of the
+# output file), so that an interrupted run can be resumed (`--resume'),
+# skipping the input that has already been processed.
+#
+# The journal is written atomically (write to a temporary file, then rename)
+# at most every `interval' seconds and once more at the end of the run.
+class Journal:
+    def __init__(self, journal_file: str, interval: float=60) -> None:
+        self.journal_file = journal_file
+        self.interval = interval
+        self.last_save = time.monotonic()
+
+    def load(self) -> Optional[Dict]:
+        if not os.path.exists(self.journal_file):
+            return None
+
+        with io.open(self.journal_file, 'r') as journal_fh:
+            return json.load(journal_fh)
+
+    # is it time for the next checkpoint?
+    def due(self) -> bool:
+        return time.monotonic() - self.last_save >= self.interval
+
+    def save(self, state: Dict) -> None:
+        tmp_file = self.journal_file + '.tmp'
+        with io.open(tmp_file, 'w') as journal_fh:
+            json.dump(state, journal_fh, indent=2)
+            journal_fh.flush()
+            os.fsync(journal_fh.fileno())
+        os.replace(tmp_file, self.journal_file)
+
+        self.last_save = time.monotonic()
@@ -0,0 +1,91 @@
+import io, json, pstats
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+# profiling data (`cProfile.Profile.stats') sent back from a worker process,
+# wrapped so `pstats.Stats' can load it
+class ProfileData:
+    def __init__(self, stats: Dict) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+# Aggregates the stats of all processed tables (see `Task.run_instrumented'
+# and `process_line' in wtu.py) and writes them as a JSON report.
+#
+# Each table's stats look like this:
+#   {
+#     'cols': 3, 'rows': 4, 'output': True,
+#     'json_load': 0.0001, 'json_dump': 0.0002,
+#     'tasks': {
+#       'EntityLinking': {'wall_time': 0.01, 'cells': 12, 'backend_queries': 9, ...},
+#       ...
+#     },
+#   }
+class StatsCollector:
+    def __init__(self, per_table: bool=False) -> None:
+        self.per_table = per_table
+
+        self.totals = Counter()
+        self.task_totals = OrderedDict() # type: Dict[str, Counter]
+        self.tables = []
+        self.profile = None # type: Optional[pstats.Stats]
+
+    def add(self, table_stats: Dict, profile_stats: Optional[Dict]=None) -> None:
+        self.totals['tables'] += 1
+        self.totals['tables_output'] += int(table_stats['output'])
+        self.totals['cells'] += table_stats['cols'] * table_stats['rows']
+        for key in ['json_load', 'json_dump']:
+            self.totals[key] += table_stats[key]
+
+        for task_name, task_stats in table_stats['tasks'].items():
+            self.task_totals.setdefault(task_name, Counter()).update(task_stats)
+
+        if self.per_table:
+            self.tables.append(table_stats)
+
+        if profile_stats is not None:
+            if self.profile is None:
+                self.profile = pstats.Stats(ProfileData(profile_stats))
+            else:
+                self.profile.add(ProfileData(profile_stats))
+
+    def report(self) -> Dict:
+        task_wall_time = sum(
+            task_totals['wall_time'] for task_totals in self.task_totals.values()
+        )
+
+        tasks = OrderedDict()
+        for task_name, task_totals in self.task_totals.items():
+            task_report = dict(task_totals)
+            task_report['wall_time_per_table'] = task_totals['wall_time'] / task_totals['tables']
+            if task_wall_time > 0:
+                task_report['wall_time_share'] = task_totals['wall_time'] / task_wall_time
+            # hit rates of the task's caches (`cache_hits', `cache_misses' etc.)
+            cache_names = dict.fromkeys(
+                key.rsplit('_', 1)[0]
+                for key in task_totals
+                if key.endswith('_hits') or key.endswith('_misses')
+            )
+            for cache_name in cache_names:
+                cache_hits = task_totals[cache_name + '_hits']
+                cache_lookups = cache_hits + task_totals[cache_name + '_misses']
+                if cache_lookups > 0:
+                    task_report[cache_name + '_hit_rate'] = cache_hits / cache_lookups
+            tasks[task_name] = task_report
+
+        report = OrderedDict(self.totals)
+        report['tasks'] = tasks
+        if self.per_table:
+            report['per_table'] = self.tables
+
+        return report
+
+    def write(self, stats_file: str, profile_file: Optional[str]=None) -> None:
+        with io.open(stats_file, 'w') as stats_fh:
+            json.dump(self.report(), stats_fh, indent=2)
+            stats_fh.write('\n')
+
+        if profile_file is not None and self.profile is not None:
+            self.profile.dump_stats(profile_file)
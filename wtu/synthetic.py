@@ -0,0 +1,214 @@
+import io, os, json, random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from wtu.util import URI
+
+# Generator for synthetic, WDC-like web tables and matching entity linking,
+# literal linking and class linking indexes (used by benchmark.py).
+#
+# Every table has a subject column of entity names. The other columns hold
+# literals of the row's entity (numbers, dates, values with units, strings)
+# or references to other entities, so that all tasks find something to
+# annotate. Everything is derived from `seed', i.e. reproducible.
+
+# column types and the headers (class linking mentions) used for them
+column_types = {
+    'entity':     ['Name', 'Person', 'Company', 'Place', 'Country'],
+    'entity_ref': ['Party', 'Team', 'Country', 'City', 'Organisation'],
+    'numeric':    ['Population', 'Number', 'Area', 'Rank'],
+    'date':       ['Born', 'Date', 'Founded', 'Released'],
+    'year':       ['Year', 'Since', 'Established'],
+    'unit':       ['Height', 'Length', 'Weight'],
+    'string':     ['Motto', 'Description', 'Notes', 'Title'],
+}
+
+# dbo classes for the headers above
+header_classes = {
+    header: 'dbo:' + header
+    for headers in column_types.values()
+    for header in headers
+}
+
+syllables = [
+    'ka', 'ro', 'vin', 'del', 'ta', 'mar', 'lo', 'sen', 'bri', 'an', 'to',
+    'ne', 'gar', 'el', 'li', 'mo', 'ra', 'dun', 'shi', 'pe', 'qu', 'ist',
+    'or', 'ban', 'ze', 'ul', 'fa', 'ric', 'ho', 'wen',
+]
+
+month_names = [
+    'January', 'February', 'March', 'April', 'May', 'June', 'July',
+    'August', 'September', 'October', 'November', 'December',
+]
+
+class SyntheticCorpus:
+    def __init__(self, n_entities: int=1000, n_extra_properties: int=5, ambiguity: float=0.2, seed: int=0) -> None:
+        self.random = random.Random(seed)
+        self.n_extra_properties = n_extra_properties
+        self.ambiguity = ambiguity
+
+        # generate unique entity names
+        names = set()
+        while len(names) < n_entities:
+            names.add(' '.join(
+                self.word(self.random.randint(2, 3))
+                for _ in range(self.random.randint(1, 3))
+            ))
+        self.entities = [self.make_entity(name) for name in sorted(names)]
+
+    def word(self, n_syllables: int) -> str:
+        return ''.join(
+            self.random.choice(syllables) for _ in range(n_syllables)
+        ).capitalize()
+
+    def sentence(self, n_words: int) -> str:
+        return ' '.join(self.word(self.random.randint(1, 3)) for _ in range(n_words))
+
+    def make_entity(self, name: str) -> Dict:
+        rnd = self.random
+        return {
+            'name': name,
+            'uri': URI('dbr', name.replace(' ', '_')).long(),
+            'frequency': rnd.randint(1, 1000),
+            'population': rnd.randint(100, 10**7),
+            'area': round(rnd.uniform(1, 10**5), 2),
+            'height': round(rnd.uniform(1.5, 2.1), 2),
+            'birth_date': (rnd.randint(1800, 2000), rnd.randint(1, 12), rnd.randint(1, 28)),
+            'founding_year': rnd.randint(1500, 2017),
+            'motto': self.sentence(rnd.randint(2, 6)),
+            'extra': [rnd.uniform(0, 10**6) for _ in range(self.n_extra_properties)],
+        }
+
+    # entity linking index: mention, URI, frequency
+    def entity_linking_index(self) -> Iterator[Tuple[str, str, int]]:
+        rnd = random.Random(1)
+        for entity in self.entities:
+            yield entity['name'], entity['uri'], entity['frequency']
+            # ambiguous mentions, e.g. the last word of the name
+            if rnd.random() < self.ambiguity:
+                yield entity['name'].split(' ')[-1], entity['uri'], rnd.randint(1, 100)
+
+    # literal linking index: entity URI, property URI, literal type, literal value
+    def literal_linking_index(self) -> Iterator[Tuple[str, str, str, str]]:
+        for entity in self.entities:
+            uri = entity['uri']
+            yield uri, 'dbo:populationTotal', 'xsd:nonNegativeInteger', str(entity['population'])
+            yield uri, 'dbo:areaTotal', 'xsd:double', repr(entity['area'])
+            yield uri, 'dbo:height', 'xsd:double', repr(entity['height'])
+            yield uri, 'dbo:birthDate', 'xsd:date', '{:04d}-{:02d}-{:02d}'.format(*entity['birth_date'])
+            yield uri, 'dbo:foundingYear', 'xsd:gYear', '{:04d}'.format(entity['founding_year'])
+            yield uri, 'dbo:motto', 'xsd:string', entity['motto']
+            for extra_idx, extra_value in enumerate(entity['extra']):
+                yield uri, 'dbo:extraProperty{:d}'.format(extra_idx), 'xsd:double', repr(extra_value)
+
+    # class linking index: mention, class URI
+    def class_linking_index(self) -> Iterator[Tuple[str, str]]:
+        for header, class_uri in sorted(header_classes.items()):
+            yield header.lower(), class_uri
+
+    # content of a cell of type `column_type' in a row about `entity'.
+    # With probability `match_rate' the content matches the entity's
+    # properties, otherwise it is random
+    def cell_content(self, column_type: str, entity: Dict, match_rate: float) -> str:
+        rnd = self.random
+        if rnd.random() >= match_rate:
+            entity = self.make_entity(self.sentence(2))
+
+        if column_type == 'entity':
+            name = entity['name']
+            variant = rnd.random()
+            if variant < 0.1:
+                return name.lower()
+            elif variant < 0.15:
+                return name + ' (' + self.word(2) + ')'
+            elif variant < 0.2:
+                # typo
+                pos = rnd.randrange(len(name))
+                return name[:pos] + rnd.choice('aeiou') + name[pos+1:]
+            return name
+        elif column_type == 'entity_ref':
+            return rnd.choice(self.entities)['name']
+        elif column_type == 'numeric':
+            if rnd.random() < 0.5:
+                return '{:,d}'.format(entity['population'])
+            return '{:d}'.format(entity['population'])
+        elif column_type == 'date':
+            year, month, day = entity['birth_date']
+            notation = rnd.randrange(3)
+            if notation == 0:
+                return '{:04d}-{:02d}-{:02d}'.format(year, month, day)
+            elif notation == 1:
+                return '{:s} {:d}, {:04d}'.format(month_names[month-1], day, year)
+            return '{:02d}/{:02d}/{:04d}'.format(month, day, year)
+        elif column_type == 'year':
+            return '{:04d}'.format(entity['founding_year'])
+        elif column_type == 'unit':
+            if rnd.random() < 0.5:
+                return '{:.2f} m'.format(entity['height'])
+            return '{:.0f} cm'.format(entity['height'] * 100)
+        elif column_type == 'string':
+            return entity['motto']
+
+        raise Exception('Unknown column type "{:s}"!'.format(column_type))
+
+    # generate a table with `n_rows' rows (plus header) and `n_cols' columns.
+    # The first column is the subject column, the types of the other columns
+    # are drawn from `types'. With probability `duplicate_rate' a row is about
+    # an entity that already appeared in the table and a cell repeats the
+    # content of a previous cell in its column.
+    def table(self, n_rows: int, n_cols: int, types: List[str], duplicate_rate: float=0.2, match_rate: float=0.8) -> Dict:
+        rnd = self.random
+        col_types = ['entity'] + [rnd.choice(types) for _ in range(n_cols - 1)]
+        columns = [[rnd.choice(column_types[col_type])] for col_type in col_types]
+
+        row_entities = []
+        for row_idx in range(n_rows):
+            if row_entities and rnd.random() < duplicate_rate:
+                entity = rnd.choice(row_entities)
+            else:
+                entity = rnd.choice(self.entities)
+            row_entities.append(entity)
+
+            for column, col_type in zip(columns, col_types):
+                if col_type != 'entity' and len(column) > 1 and rnd.random() < duplicate_rate:
+                    column.append(rnd.choice(column[1:]))
+                else:
+                    column.append(self.cell_content(col_type, entity, match_rate))
+
+        return {
+            'relation': columns,
+            'headerRowIndex': 0,
+            'pageTitle': self.sentence(3),
+            'url': 'http://example.org/' + self.word(3).lower(),
+        }
+
+    def tables(self, n_tables: int, n_rows: int, n_cols: int, types: Optional[List[str]]=None, duplicate_rate: float=0.2, match_rate: float=0.8) -> Iterator[Dict]:
+        if types is None:
+            types = list(column_types)
+        for _ in range(n_tables):
+            yield self.table(n_rows, n_cols, types, duplicate_rate, match_rate)
+
+    # write tables and indexes to `out_dir', returns the file names
+    def write(self, out_dir: str, tables: Iterator[Dict]) -> Dict[str, str]:
+        os.makedirs(out_dir, exist_ok=True)
+        files = {
+            'tables': os.path.join(out_dir, 'tables.json'),
+            'EntityLinking': os.path.join(out_dir, 'entity_linking.csv'),
+            'LiteralLinking': os.path.join(out_dir, 'literal_linking.csv'),
+            'ClassLinking': os.path.join(out_dir, 'class_linking.csv'),
+        }
+        indexes = {
+            'EntityLinking': self.entity_linking_index(),
+            'LiteralLinking': self.literal_linking_index(),
+            'ClassLinking': self.class_linking_index(),
+        }
+
+        with io.open(files['tables'], 'w', encoding='utf-8') as tables_fh:
+            for table_data in tables:
+                tables_fh.write(json.dumps(table_data) + '\n')
+
+        for index_name, index_rows in indexes.items():
+            with io.open(files[index_name], 'w', encoding='utf-8') as index_fh:
+                for index_row in index_rows:
+                    index_fh.write('\t'.join(map(str, index_row)) + '\n')
+
+        return files
@@ -1,5 +1,98 @@
 from abc import ABCMeta, abstractmethod
-from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, Tuple, Type, TypeVar
+from heapq import merge
+from typing import Any, Callable, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+AnnotationKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# list of annotations with a secondary index on the annotations'
+# (source, task, type), so filtered lookups (see `find') take O(matches)
+# instead of comparing every annotation. The index is built on the first
+# lookup and kept up to date by `append' and `extend'. Any other
+# modification drops it (it is rebuilt on the next lookup).
+#
+# A list created for a cell/column/row without annotations is detached: it
+# is only stored in the table's annotations (`owner[key]') on its first
+# modification, so reading annotations leaves the table data untouched.
+class AnnotationList(list):
+    __slots__ = ('_index', '_owner', '_key')
+
+    def __init__(self, annotations: Iterable[Dict]=(), owner: Optional[Dict]=None, key: Optional[str]=None) -> None:
+        super().__init__(annotations)
+        self._index = None # type: Optional[Dict[AnnotationKey, List[int]]]
+        self._owner = owner
+        self._key = key
+
+    # store a detached list in its owner
+    def attach(self) -> None:
+        if self._owner is not None:
+            self._owner[self._key] = self
+            self._owner = None
+
+    # (pickle restores list items via `append' before the slots, so rebuild
+    # from the items instead. The index is rebuilt on the next lookup)
+    def __reduce__(self) -> Tuple:
+        return (AnnotationList, (list(self), self._owner, self._key))
+
+    @staticmethod
+    def key(annotation: Dict) -> AnnotationKey:
+        return (annotation.get('source'), annotation.get('task'), annotation.get('type'))
+
+    def build_index(self) -> Dict[AnnotationKey, List[int]]:
+        self._index = {}
+        for anno_idx, annotation in enumerate(self):
+            self._index.setdefault(self.key(annotation), []).append(anno_idx)
+        return self._index
+
+    def append(self, annotation: Dict) -> None:
+        if self._owner is not None:
+            self.attach()
+        if self._index is not None:
+            self._index.setdefault(self.key(annotation), []).append(len(self))
+        super().append(annotation)
+
+    def extend(self, annotations: Iterable[Dict]) -> None:
+        for annotation in annotations:
+            self.append(annotation)
+
+    def __iadd__(self, annotations: Iterable[Dict]) -> 'AnnotationList':
+        self.extend(annotations)
+        return self
+
+    # positions of all annotations matching the given source, task and type
+    # (`None' matches anything), in list order
+    def find_indices(self, anno_source: Optional[str]=None, anno_task: Optional[str]=None, anno_type: Optional[str]=None) -> List[int]:
+        index = self._index
+        if index is None:
+            index = self.build_index()
+
+        matching = [
+            anno_idxs
+            for (source, task, type_), anno_idxs in index.items()
+            if (anno_source is None or source == anno_source) and
+            (anno_task is None or task == anno_task) and
+            (anno_type is None or type_ == anno_type)
+        ]
+
+        if len(matching) == 1:
+            return list(matching[0])
+        return list(merge(*matching))
+
+    def find(self, anno_source: Optional[str]=None, anno_task: Optional[str]=None, anno_type: Optional[str]=None) -> List[Dict]:
+        return [self[anno_idx] for anno_idx in self.find_indices(anno_source, anno_task, anno_type)]
+
+# all other modifications invalidate the index (and attach detached lists)
+def _invalidating(method_name: str) -> Callable:
+    method = getattr(list, method_name)
+    def invalidating_method(self, *args, **kwargs):
+        if self._owner is not None:
+            self.attach()
+        self._index = None
+        return method(self, *args, **kwargs)
+    invalidating_method.__name__ = method_name
+    return invalidating_method
+
+for _method_name in ['__setitem__', '__delitem__', '__imul__', 'insert', 'pop', 'remove', 'clear', 'sort', 'reverse']:
+    setattr(AnnotationList, _method_name, _invalidating(_method_name))
 
 class Table:
     def __init__(self, table_data: Dict) -> None:
@@ -7,10 +100,23 @@ class Table:
 
         if 'annotations' not in self.table_data:
             self.table_data['annotations'] = {}
+        else:
+            # index existing annotations (dropping empty lists)
+            self.table_data['annotations'] = {
+                anno_idx: AnnotationList(annotations)
+                for anno_idx, annotations in self.table_data['annotations'].items()
+                if len(annotations)
+            }
 
         self.num_cols = len(self.table_data['relation'])
         self.num_rows = len(self.table_data['relation'][0])
 
+        # views of the table's cells, columns and rows (created on first use)
+        self._cell_views = None # type: Optional[List[List[TableCell]]]
+        self._column_views = {} # type: Dict[int, TableColumn]
+        self._row_views = {} # type: Dict[int, TableRow]
+        self._table_annotations = None # type: Optional[AnnotationList]
+
     @property
     def relation(self):
         return self.table_data['relation']
@@ -19,14 +125,22 @@ class Table:
     def _annotations(self):
         return self.table_data['annotations']
 
+    # the annotation list stored under `anno_idx' ('n:m', 'n:', ':m' or ':').
+    # If there is none, a detached list is returned that is added to the
+    # table's annotations when the first annotation is added to it. The
+    # views below keep the list they got, so there is only one per index
+    def annotation_list(self, anno_idx: str) -> AnnotationList:
+        annotations = self.table_data['annotations']
+        try:
+            return annotations[anno_idx]
+        except KeyError:
+            return AnnotationList(owner=annotations, key=anno_idx)
+
     @property
     def annotations(self):
-        anno_idx = ':'
-
-        if anno_idx not in self.table_data['annotations']:
-            self.table_data['annotations'][anno_idx] = []
-
-        return self.table_data['annotations'][anno_idx]
+        if self._table_annotations is None:
+            self._table_annotations = self.annotation_list(':')
+        return self._table_annotations
 
     def get_annotation(self, anno_id):
         cell_idx, anno_idx = anno_id.split('/')
@@ -34,13 +148,6 @@ class Table:
         return self.table_data['annotations'][cell_idx][int(anno_idx)]
 
     def dump(self) -> Dict:
-        # clean annotations
-        self.table_data['annotations'] = {
-            k: v
-            for k, v in self.table_data['annotations'].items()
-            if len(v)
-        }
-
         return self.table_data
 
     def cells(self, *conditions: Callable[['TableCell'], bool]) -> 'TableCellSet':
@@ -52,11 +159,23 @@ class Table:
     def rows(self, *conditions: Callable[['TableRow'], bool]) -> 'TableRowSet':
         return TableRowSet(self, *conditions)
 
+    # views of all cells (list of columns), created once per table
+    def cell_views(self) -> List[List['TableCell']]:
+        if self._cell_views is None:
+            cellset = TableCellSet(self)
+            self._cell_views = [
+                [TableCell(cellset, (col_idx, row_idx)) for row_idx in range(self.num_rows)]
+                for col_idx in range(self.num_cols)
+            ]
+        return self._cell_views
+
 I_T = TypeVar('I_T')
 E_T = TypeVar('E_T')
 S_T = TypeVar('S_T')
 
 class QueryResult(Generic[I_T]):
+    __slots__ = ('parent_set', 'idx')
+
     def __init__(self, parent_set: 'QueryableSet', idx: I_T) -> None:
         self.parent_set = parent_set
         self.idx = idx
@@ -66,13 +185,11 @@ class QueryResult(Generic[I_T]):
         return self.parent_set.data(self.idx)
 
     def find_annotations(self, anno_source=None, anno_task=None, anno_type=None):
-        return [
-            annotation
-            for annotation in self.annotations
-            if (anno_source is None or annotation['source'] == anno_source) and
-            (anno_task is None or annotation['task'] == anno_task) and
-            (anno_type is None or annotation['type'] == anno_type)
-        ]
+        return self.annotations.find(anno_source, anno_task, anno_type)
+
+    # like `find_annotations', but returns the annotations' positions
+    def find_annotation_indices(self, anno_source=None, anno_task=None, anno_type=None):
+        return self.annotations.find_indices(anno_source, anno_task, anno_type)
 
 class QueryableSet(Generic[S_T, E_T, I_T], metaclass=ABCMeta):
     def __init__(self, data_source: S_T, element_type: Type[E_T], *conditions: Callable[[E_T], bool]) -> None:
@@ -97,25 +214,28 @@ class QueryableSet(Generic[S_T, E_T, I_T], metaclass=ABCMeta):
             if all(map(lambda condition: condition(element), self.conditions)):
                 yield element
 
+# A table cell. Cell views are created once per table (see
+# `Table.cell_views') and hold the cell's content and (once accessed) its
+# annotation list directly, so accessing them does not need any lookups.
 class TableCell(QueryResult[Tuple[int, int]]):
-    def __init__(self, parent_set: 'TableCellSet', idx: Tuple[int, int]) -> None:
-        super().__init__(parent_set, idx)
-
-    @property
-    def col_idx(self):
-        return self.idx[0]
-
-    @property
-    def row_idx(self):
-        return self.idx[1]
+    __slots__ = ('col_idx', 'row_idx', 'anno_idx', 'content', '_annotations')
 
-    @property
-    def content(self) -> str:
-        return self.my_data['content']
+    def __init__(self, parent_set: 'TableCellSet', idx: Tuple[int, int]) -> None:
+        self.parent_set = parent_set
+        self.idx = idx
+        self.col_idx, self.row_idx = idx
+        self.anno_idx = '{:d}:{:d}'.format(*idx)
+        self.content = parent_set.table.relation[idx[0]][idx[1]] # type: str
+        self._annotations = None # type: Optional[AnnotationList]
 
+    # the annotation list is looked up on first access (keeps the order of
+    # the table's annotations the same as before)
     @property
-    def annotations(self) -> List[Dict]:
-        return self.my_data['annotations']
+    def annotations(self) -> AnnotationList:
+        annotations = self._annotations
+        if annotations is None:
+            annotations = self._annotations = self.parent_set.table.annotation_list(self.anno_idx)
+        return annotations
 
 class TableCellSet(QueryableSet[Table, TableCell, Tuple[int, int]]):
     def __init__(self, table: Table, *conditions: Callable[[TableCell], bool]) -> None:
@@ -127,17 +247,32 @@ class TableCellSet(QueryableSet[Table, TableCell, Tuple[int, int]]):
             for row_idx in range(self.table.num_rows):
                 yield (col_idx, row_idx)
 
+    # the set's cell views in `indices' order (before applying conditions)
+    def cell_views(self) -> Iterator[TableCell]:
+        for column in self.table.cell_views():
+            yield from column
+
     def data(self, idx: Tuple[int, int]) -> Any:
         col_idx, row_idx = idx
-        anno_idx = '{:d}:{:d}'.format(col_idx, row_idx)
-        if anno_idx not in self.table._annotations:
-            self.table._annotations[anno_idx] = []
-
         return {
             'content': self.table.relation[col_idx][row_idx],
-            'annotations': self.table._annotations[anno_idx],
+            'annotations': self[idx].annotations,
         }
 
+    def __getitem__(self, idx: Tuple[int, int]) -> TableCell:
+        col_idx, row_idx = idx
+        return self.table.cell_views()[col_idx][row_idx]
+
+    def __iter__(self) -> Iterator[TableCell]:
+        conditions = self.conditions
+        if not conditions:
+            return self.cell_views()
+        return (
+            cell
+            for cell in self.cell_views()
+            if all(condition(cell) for condition in conditions)
+        )
+
     def where(self, *conditions: Callable[[TableCell], bool]) -> 'TableCellSet':
         return TableCellSet(self.table, *self.conditions, *conditions)
 
@@ -146,14 +281,14 @@ class TableColumn(TableCellSet, QueryResult[int]):
         TableCellSet.__init__(self, parent_set.table)
         QueryResult.__init__(self, parent_set, col_idx)
         self.col_idx = col_idx
+        self.annotations = self.table.annotation_list('{:d}:'.format(col_idx))
 
     def indices(self) -> Iterator[Tuple[int, int]]:
         for row_idx in range(self.table.num_rows):
             yield (self.col_idx, row_idx)
 
-    @property
-    def annotations(self) -> List[Dict]:
-        return self.my_data['annotations']
+    def cell_views(self) -> Iterator[TableCell]:
+        return iter(self.table.cell_views()[self.col_idx])
 
 class TableColumnSet(QueryableSet[Table, TableColumn, int]):
     def __init__(self, table: Table, *conditions: Callable[[TableColumn], bool]) -> None:
@@ -164,15 +299,19 @@ class TableColumnSet(QueryableSet[Table, TableColumn, int]):
         return iter(range(self.table.num_cols))
 
     def data(self, col_idx: int) -> List[str]:
-        anno_idx = '{:d}:'.format(col_idx)
-        if anno_idx not in self.table._annotations:
-            self.table._annotations[anno_idx] = []
-
         return {
             'column': self.table.relation[col_idx],
-            'annotations': self.table._annotations[anno_idx],
+            'annotations': self[col_idx].annotations,
         }
 
+    # column views are created once per table
+    def __getitem__(self, col_idx: int) -> TableColumn:
+        try:
+            return self.table._column_views[col_idx]
+        except KeyError:
+            column = self.table._column_views[col_idx] = TableColumn(TableColumnSet(self.table), col_idx)
+            return column
+
     def where(self, *conditions: Callable[[TableColumn], bool]) -> 'TableColumnSet':
         return TableColumnSet(self.table, *self.conditions, *conditions)
 
@@ -181,14 +320,15 @@ class TableRow(TableCellSet, QueryResult[int]):
         TableCellSet.__init__(self, parent_set.table)
         QueryResult.__init__(self, parent_set, row_idx)
         self.row_idx = row_idx
+        self.annotations = self.table.annotation_list(':{:d}'.format(row_idx))
 
     def indices(self) -> Iterator[Tuple[int, int]]:
         for col_idx in range(self.table.num_cols):
             yield (col_idx, self.row_idx)
 
-    @property
-    def annotations(self) -> List[Dict]:
-        return self.my_data['annotations']
+    def cell_views(self) -> Iterator[TableCell]:
+        row_idx = self.row_idx
+        return (column[row_idx] for column in self.table.cell_views())
 
 class TableRowSet(QueryableSet[Table, TableRow, int]):
     def __init__(self, table: Table, *conditions: Callable[[TableRow], bool]) -> None:
@@ -199,14 +339,18 @@ class TableRowSet(QueryableSet[Table, TableRow, int]):
         return iter(range(self.table.num_rows))
 
     def data(self, row_idx: int) -> List[str]:
-        anno_idx = ':{:d}'.format(row_idx)
-        if anno_idx not in self.table._annotations:
-            self.table._annotations[anno_idx] = []
-
         return {
             'row': [ col[row_idx] for col in self.table.relation ],
-            'annotations': self.table._annotations[anno_idx],
+            'annotations': self[row_idx].annotations,
         }
 
+    # row views are created once per table
+    def __getitem__(self, row_idx: int) -> TableRow:
+        try:
+            return self.table._row_views[row_idx]
+        except KeyError:
+            row = self.table._row_views[row_idx] = TableRow(TableRowSet(self.table), row_idx)
+            return row
+
     def where(self, *conditions: Callable[[TableRow], bool]) -> 'TableRowSet':
         return TableRowSet(self.table, *self.conditions, *conditions)
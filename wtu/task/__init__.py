@@ -1,7 +1,136 @@
 from abc import ABCMeta, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Tuple
+import time
+
 from wtu.table import Table
 
 class Task(metaclass=ABCMeta):
     @abstractmethod
     def run(self, table: Table) -> bool:
         pass
+
+    # counters for the table currently being processed
+    # (e.g. number of backend queries). Tasks increment them in `run'
+    @property
+    def stats(self) -> Counter:
+        try:
+            return self._stats
+        except AttributeError:
+            self._stats = Counter()
+            return self._stats
+
+    # run the task on `table' and measure wall time, number of cells and the
+    # task's own counters. Returns `run's result and the collected stats
+    def run_instrumented(self, table: Table) -> Tuple[bool, Dict]:
+        self._stats = Counter()
+
+        start = time.perf_counter()
+        res = self.run(table)
+        wall_time = time.perf_counter() - start
+
+        stats = dict(self._stats)
+        stats['wall_time'] = wall_time
+        stats['cells'] = table.num_cols * table.num_rows
+        stats['tables'] = 1
+
+        return res, stats
+
+# LRU cache of at most `size' items. Hits, misses and evictions are counted
+# in the task's stats (`<stats_prefix>_hits' etc.)
+class LRUCache:
+    def __init__(self, size: int, task: Task, stats_prefix: str='cache') -> None:
+        self.size = size
+        self.task = task
+        self.cache = OrderedDict() # type: OrderedDict
+
+        self.stats_hits = stats_prefix + '_hits'
+        self.stats_misses = stats_prefix + '_misses'
+        self.stats_evictions = stats_prefix + '_evictions'
+
+    def get(self, key: Any) -> Any:
+        try:
+            res = self.cache[key]
+        except KeyError:
+            self.task.stats[self.stats_misses] += 1
+            raise
+        self.task.stats[self.stats_hits] += 1
+        self.cache.move_to_end(key)
+        return res
+
+    def put(self, key: Any, res: Any) -> Any:
+        self.cache[key] = res
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+            self.task.stats[self.stats_evictions] += 1
+        return res
+
+# LRU cache for a task's backend (`cache' parameter of the tasks that use
+# backends). Wraps the backend's query methods (see `cached_methods'), all
+# other attributes are passed through. Each worker process has its own cache
+# of at most `size' results, shared by all tables the worker processes.
+# Cache hits, misses and evictions are counted in the task's stats.
+#
+# Batch methods (`query_many' etc., see `cached_many_methods') share the
+# cache with their single item counterparts and only pass the items that
+# are not cached on to the backend.
+#
+# Cached results are shared, callers must not modify them.
+class CachedBackend(LRUCache):
+    cached_methods = ['query', 'query_ranked', 'fuzzy_search']
+    cached_many_methods = {
+        'query_many': 'query',
+        'query_ranked_many': 'query_ranked',
+    }
+
+    def __init__(self, backend: Any, size: int, task: Task) -> None:
+        super().__init__(size, task)
+        self.backend = backend
+
+        for method_name in self.cached_methods:
+            if hasattr(backend, method_name):
+                setattr(self, method_name, self.cached(method_name))
+        for method_name, single_method_name in self.cached_many_methods.items():
+            if hasattr(backend, method_name):
+                setattr(self, method_name, self.cached_many(method_name, single_method_name))
+
+    def cached(self, method_name: str) -> Callable:
+        method = getattr(self.backend, method_name)
+
+        def cached_method(*args, **kwargs):
+            key = (method_name, args, tuple(sorted(kwargs.items())))
+            try:
+                res = self.get(key)
+            except KeyError:
+                res = self.put(key, method(*args, **kwargs))
+            return res
+
+        cached_method.__name__ = method_name
+        return cached_method
+
+    def cached_many(self, method_name: str, single_method_name: str) -> Callable:
+        method = getattr(self.backend, method_name)
+
+        def cached_many_method(items):
+            res = [None] * len(items)
+            missing_idxs = []
+            for item_idx, item in enumerate(items):
+                try:
+                    res[item_idx] = self.get((single_method_name, (item,), ()))
+                except KeyError:
+                    missing_idxs.append(item_idx)
+
+            if missing_idxs:
+                missing_res = method([items[item_idx] for item_idx in missing_idxs])
+                for item_idx, item_res in zip(missing_idxs, missing_res):
+                    res[item_idx] = self.put((single_method_name, (items[item_idx],), ()), item_res)
+            return res
+
+        cached_many_method.__name__ = method_name
+        return cached_many_method
+
+    def __getattr__(self, name: str) -> Any:
+        # (`backend' is not set yet when unpickling)
+        if name == 'backend':
+            raise AttributeError(name)
+        return getattr(self.backend, name)
@@ -2,9 +2,18 @@ from abc import ABCMeta, abstractmethod
 
 import io, csv
 
-from wtu.task import Task
+from wtu.task import Task, CachedBackend
 from wtu.table import Table
-from wtu.util import URI
+from wtu.util import URI, dump_binary_index, load_binary_index
+
+# read a class linking index in TSV format (mention, class URI) and yield its
+# entries with lower case mentions and parsed URIs
+def read_index_csv(index_file, delimiter='\t', quotechar=None):
+    with io.open(index_file, 'r', encoding='utf-8', errors='ignore') as index_fh:
+        csv_reader = csv.reader(index_fh, delimiter=delimiter, quotechar=quotechar)
+        for row in csv_reader:
+            mention, uri = row
+            yield mention.lower(), URI.parse(uri, 'dbo')
 
 class ClassLinking(Task):
     backends_available = {}
@@ -13,17 +22,22 @@ class ClassLinking(Task):
     def register_backend(cls, name, backend):
         cls.backends_available[name] = backend
 
-    def __init__(self, backend):
+    def __init__(self, backend, cache=None):
         backend_name, backend_args = backend
         self.backend = ClassLinking.backends_available[backend_name](**backend_args)
+        # cache backend results across tables (LRU, `cache' results per process)
+        if cache:
+            self.backend = CachedBackend(self.backend, cache, self)
 
     def run(self, table):
         if 'headerRowIndex' in table.table_data:
             header_row_index = table.table_data['headerRowIndex']
             if header_row_index != -1:
                 header_row = table.rows()[header_row_index]
-                for cell in header_row:
-                    class_uri = self.backend.query(cell.content)
+                header_cells = list(header_row)
+                class_uris = self.backend.query_many([cell.content for cell in header_cells])
+                self.stats['backend_queries'] += len(header_cells)
+                for cell, class_uri in zip(header_cells, class_uris):
                     if class_uri is not None:
                         class_uri = URI.parse(class_uri, 'dbo')
                         cell.annotations.append({
@@ -39,15 +53,17 @@ class ClassLinkingBackend(metaclass=ABCMeta):
     @abstractmethod
     def query(self, mention): pass
 
+    # batch version of `query' (list of mentions, returns a list of results).
+    # Backends that can look up many mentions at once override it
+    def query_many(self, mentions):
+        return [self.query(mention) for mention in mentions]
+
 class ClassLinkingBackendCSV(ClassLinkingBackend):
     def __init__(self, index_file, delimiter='\t', quotechar=None):
         self.index = {}
 
-        with io.open(index_file, 'r', encoding='utf-8', errors='ignore') as index_fh:
-            csv_reader = csv.reader(index_fh, delimiter=delimiter, quotechar=quotechar)
-            for row in csv_reader:
-                mention, uri = row
-                self.index[mention.lower()] = URI.parse(uri, 'dbo').short()
+        for mention, uri in read_index_csv(index_file, delimiter, quotechar):
+            self.index[mention] = uri.short()
 
     def query(self, mention):
         mention = mention.lower()
@@ -57,4 +73,20 @@ class ClassLinkingBackendCSV(ClassLinkingBackend):
         except KeyError:
             return None
 
+# binary backend
+#
+# Same as the CSV backend, but loads a precompiled index (see `build')
+class ClassLinkingBackendBinary(ClassLinkingBackendCSV):
+    index_format = 'ClassLinking/1'
+
+    def __init__(self, index_file):
+        self.index = load_binary_index(index_file, self.index_format)
+
+    # convert a TSV index (as read by the CSV backend) to a binary index file
+    @classmethod
+    def build(cls, index_file, output_file, delimiter='\t', quotechar=None):
+        index = ClassLinkingBackendCSV(index_file, delimiter, quotechar).index
+        dump_binary_index(index, cls.index_format, output_file)
+
 ClassLinking.register_backend('csv', ClassLinkingBackendCSV)
+ClassLinking.register_backend('binary', ClassLinkingBackendBinary)
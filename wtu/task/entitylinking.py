@@ -1,13 +1,15 @@
 from abc import ABCMeta, abstractmethod
-import io, csv, re, string
+import io, csv, re, math, string, struct, mmap, zlib
 from operator import itemgetter
 from collections import defaultdict, Counter
+from functools import lru_cache
+from itertools import islice
 import Levenshtein
 from unidecode import unidecode
 
-from wtu.task import Task
+from wtu.task import Task, CachedBackend
 from wtu.table import Table
-from wtu.util import URI
+from wtu.util import URI, dump_binary_index, load_binary_index, create_sqlite_index, SQLiteIndex, bounded_levenshtein_distance, max_levenshtein_distance
 
 # Levenshtein similarity. Between 0 and 1
 # 0: completely differnt
@@ -17,20 +19,200 @@ def levenshtein_similarity(str_a, str_b):
     max_len = max(len(str_a), len(str_b))
     return 1 - edit_distance/max_len
 
+# Index for fuzzy mention lookups (see `search')
+#
+# The mentions are grouped by length and each group is stored in a BK-tree
+# (metric tree over the Levenshtein distance). A search only visits the
+# groups whose length can reach the cutoff and, within a group, the subtrees
+# that can contain mentions within the maximum edit distance.
+class FuzzyIndex:
+    def __init__(self, mentions):
+        self.mentions = list(mentions)
+        # BK-tree per mention length: root mention id per length and the
+        # children of each mention ({distance: mention id})
+        self.roots = {}
+        self.children = [None] * len(self.mentions)
+
+        for mention_idx, mention in enumerate(self.mentions):
+            self.add(mention_idx, mention)
+
+    def add(self, mention_idx, mention):
+        node_idx = self.roots.get(len(mention))
+        if node_idx is None:
+            self.roots[len(mention)] = mention_idx
+            return
+
+        while True:
+            distance = Levenshtein.distance(mention, self.mentions[node_idx])
+            children = self.children[node_idx]
+            if children is None:
+                children = self.children[node_idx] = {}
+            if distance not in children:
+                children[distance] = mention_idx
+                return
+            node_idx = children[distance]
+
+    # ids (positions in `mentions') of all mentions with a
+    # `levenshtein_similarity' of at least `fuzzy_cutoff', in index order
+    def search(self, mention, fuzzy_cutoff=1):
+        if fuzzy_cutoff <= 0:
+            return list(range(len(self.mentions)))
+
+        # similarity = 1 - distance/max_len >= cutoff requires
+        # cutoff*len(mention) <= len(index_mention) <= len(mention)/cutoff
+        # and distance <= (1-cutoff)*max_len (epsilon: float rounding, see
+        # `max_levenshtein_distance')
+        mention_len = len(mention)
+        min_len = max(math.ceil(fuzzy_cutoff * mention_len - 1e-9), 1)
+        max_len = math.floor(mention_len / fuzzy_cutoff + 1e-9)
+
+        res = []
+        for index_mention_len in range(min_len, max_len + 1):
+            root_idx = self.roots.get(index_mention_len)
+            if root_idx is None:
+                continue
+            group_max_len = max(mention_len, index_mention_len)
+            max_distance = max_levenshtein_distance(group_max_len, fuzzy_cutoff)
+
+            nodes = [root_idx]
+            while nodes:
+                node_idx = nodes.pop()
+                index_mention = self.mentions[node_idx]
+                # the exact distance is only needed up to the largest one
+                # that can still lead into a subtree (see below)
+                children = self.children[node_idx]
+                distance_bound = max_distance
+                if children is not None:
+                    distance_bound += max(children)
+                distance = bounded_levenshtein_distance(mention, index_mention, distance_bound)
+                if distance <= max_distance and 1 - distance/group_max_len >= fuzzy_cutoff:
+                    res.append(node_idx)
+
+                # triangle inequality: only subtrees at a distance of
+                # `distance' +/- `max_distance' can contain matches
+                if children is not None:
+                    for child_distance, child_idx in children.items():
+                        if abs(child_distance - distance) <= max_distance:
+                            nodes.append(child_idx)
+
+        res.sort()
+        return res
+
+# Normalizes mentions for index lookups (see `normalize'). Results are
+# memoized (LRU, `cache_size' mentions). The index files are normalized in
+# batches (`normalize_many') without filling the memo.
+class MentionNormalizer:
+    # trailing parentheses/brackets
+    trailing_parens_re = re.compile(r'(?:\([^)]*\)|\[[^]]*\])\s*$')
+    # spaces and punctuation
+    delete_table = str.maketrans('', '', ' ' + string.punctuation)
+
+    def __init__(self, cache_size=65536):
+        self.normalize = lru_cache(maxsize=cache_size)(self.normalize_uncached)
+
+    def normalize_uncached(self, mention):
+        # lower case
+        mention = mention.lower()
+        # remove trailing parentheses/brackets
+        if ')' in mention or ']' in mention:
+            mention = self.trailing_parens_re.sub('', mention)
+        # remove spaces and punctuation
+        mention = mention.translate(self.delete_table)
+        # translate unicode characters to ASCII (e.g. 'ç' -> 'c')
+        try:
+            mention.encode('ascii')
+        except UnicodeEncodeError:
+            mention = unidecode(mention)
+
+        return mention
+
+    # normalize a batch of mentions (e.g. a column or a chunk of an index
+    # file), each distinct mention only once
+    def normalize_many(self, mentions):
+        normalized = {}
+        res = []
+        for mention in mentions:
+            try:
+                res.append(normalized[mention])
+            except KeyError:
+                normalized[mention] = self.normalize_uncached(mention)
+                res.append(normalized[mention])
+        return res
+
+mention_normalizer = MentionNormalizer()
+
 def preprocess_mention(mention):
-    # lower case
-    mention = mention.lower()
-    # remove trailing parentheses/brackets
-    mention = re.sub(r'(?:\([^)]*\)|\[[^]]*\])\s*$', '', mention)
-    # remove spaces
-    mention = mention.replace(' ', '')
-    # remove remaining punctuation
-    mention = mention.translate(str.maketrans('', '', string.punctuation))
-    # translate unicode characters to ASCII (e.g. 'ç' -> 'c')
-    mention = unidecode(mention)
+    return mention_normalizer.normalize(mention)
+
+# read an entity linking index in TSV format (mention, URI, frequency) and
+# yield its entries with preprocessed mentions and parsed URIs
+def read_index_csv(index_file, delimiter='\t', quotechar=None):
+    with io.open(index_file, 'r', encoding='utf-8', errors='ignore') as index_fh:
+        csv_reader = csv.reader(index_fh, delimiter=delimiter, quotechar=quotechar)
+        while True:
+            rows = list(islice(csv_reader, 10000))
+            if not rows:
+                break
+
+            mentions = mention_normalizer.normalize_many(row[0] for row in rows)
+            for mention, (_, uri, frequency) in zip(mentions, rows):
+                if mention:
+                    uri = URI.parse(uri, 'dbr')
+                    yield mention, uri, int(frequency)
+
+# merge the frequencies of duplicate URIs in `entities' (list of (URI,
+# frequency)) and sort them by frequency (descending, ties in order of first
+# occurrence). Returns a list of (URI, frequency)
+def merge_entities(entities):
+    uris = {}
+    frequencies = Counter()
+    for uri, frequency in entities:
+        uri_long = uri.long()
+        uris.setdefault(uri_long, uri)
+        frequencies[uri_long] += frequency
+
+    ranked = sorted(
+        frequencies.items(),
+        key=itemgetter(1),
+        reverse=True
+    )
+
+    return [
+        (uris[uri_long], frequency)
+        for uri_long, frequency in ranked
+    ]
+
+# normalize the frequencies of merged entities (see `merge_entities') by the
+# sum of all frequencies
+def normalize_entities(entities):
+    frequency_sum = sum(
+        map(itemgetter(1), entities)
+    )
+
+    return [
+        (uri, frequency/frequency_sum if frequency_sum else 0.0)
+        for uri, frequency in entities
+    ]
+
+# merge and sort the entities (see `merge_entities'). Returns a list of
+# (URI, normalized frequency); frequencies are normalized by the sum of all
+# frequencies in `entities'
+def rank_entities(entities):
+    return normalize_entities(merge_entities(entities))
 
-    return mention
+# read a TSV index (see `read_index_csv') and merge each mention's entities
+# (see `merge_entities'). Returns a dictionary mention -> entities, in index
+# file order. The backends store these merged lists, so ranking a mention's
+# entities only means normalizing them (see `normalize_entities')
+def read_index_merged(index_file, delimiter='\t', quotechar=None):
+    index = defaultdict(list)
+    for mention, uri, frequency in read_index_csv(index_file, delimiter, quotechar):
+        index[mention].append((uri, frequency))
 
+    return {
+        mention: merge_entities(entities)
+        for mention, entities in index.items()
+    }
 
 class EntityLinking(Task):
     backends_available = {}
@@ -39,15 +221,29 @@ class EntityLinking(Task):
     def register_backend(cls, name, backend):
         cls.backends_available[name] = backend
 
-    def __init__(self, backend, top_n=3, fuzzy=None):
+    # LiteralNormalization annotation types of cells that are not entities
+    literal_types = {'numeric', 'date', 'value and unit'}
+
+    def __init__(self, backend, top_n=3, fuzzy=None, cache=None, skip_literal_columns=None):
         self.top_n = top_n
         self.fuzzy = fuzzy
         if self.fuzzy is None:
             self.fuzzy = [False, 1]
+        # skip columns in which at least this share of the (non-empty) cells
+        # has been typed as a literal by LiteralNormalization (None: never)
+        self.skip_literal_columns = skip_literal_columns
 
         # instantiate backend
         backend_name, backend_args = backend
         self.backend = EntityLinking.backends_available[backend_name](**backend_args)
+        # cache backend results across tables (LRU, `cache' results per process)
+        if cache:
+            self.backend = CachedBackend(self.backend, cache, self)
+
+        # build the fuzzy index now (i.e. before the worker processes are
+        # forked) instead of in every worker
+        if self.fuzzy[0] and hasattr(self.backend, 'fuzzy_index'):
+            self.backend.fuzzy_index()
 
     def run(self, table: Table) -> None:
         cellset = table.cells()
@@ -57,35 +253,20 @@ class EntityLinking(Task):
             if header_row_index != -1:
                 cellset = cellset.where(lambda cell: cell.row_idx != header_row_index)
 
-        # iterate over all cells
-        for cell in cellset:
-            # query the backend for mentions of the cell's content
-            query_res = self.backend.query(cell.content)
-
-            if self.fuzzy[0] and len(query_res) == 0:
-                query_res = self.backend.fuzzy_search(cell.content, fuzzy_cutoff=self.fuzzy[1])
-
-            query_res_unique = Counter()
-            for uri, freq in query_res:
-                query_res_unique[uri.long()] += freq
-
-            # get top <n> results (weighted by frequency of occurrence)
-            top_n_res = sorted(
-                query_res_unique.items(),
-                key=itemgetter(1),
-                reverse=True
-            )[:self.top_n]
-
-            # sum all frequencies to normalize the individual frequencies
-            frequency_sum = sum(
-                map(itemgetter(1), query_res)
-            )
+        cells = list(cellset)
+        if self.skip_literal_columns is not None:
+            cells = self.skip_literals(cells)
 
-            # add annotations for each identified entity
-            for entity in top_n_res:
-                uri, frequency = entity
-                normalized_frequency = frequency/frequency_sum
+        # link each distinct cell content once (tables repeat values a lot),
+        # with a single batch query to the backend
+        contents = list(dict.fromkeys(cell.content for cell in cells))
+        self.stats['repeated_contents'] += len(cells) - len(contents)
+        entities_by_content = dict(zip(contents, self.link_many(contents)))
 
+        # iterate over all cells
+        for cell in cells:
+            # add annotations for each identified entity
+            for uri, normalized_frequency in entities_by_content[cell.content]:
                 cell.annotations.append({
                     'source': 'preprocessing',
                     'task': 'EntityLinking',
@@ -96,27 +277,84 @@ class EntityLinking(Task):
 
         return True
 
+    # remove the cells of columns that mostly contain literals (numbers,
+    # dates, values with units) according to LiteralNormalization
+    def skip_literals(self, cells):
+        n_cells = Counter()
+        n_literals = Counter()
+        for cell in cells:
+            if not cell.content:
+                continue
+            n_cells[cell.col_idx] += 1
+            if any(
+                anno['type'] in self.literal_types
+                for anno in cell.find_annotations(anno_source='preprocessing', anno_task='LiteralNormalization')
+            ):
+                n_literals[cell.col_idx] += 1
+
+        skip_col_idxs = {
+            col_idx
+            for col_idx, n_col_cells in n_cells.items()
+            if n_literals[col_idx] >= self.skip_literal_columns * n_col_cells
+        }
+        if not skip_col_idxs:
+            return cells
+
+        remaining_cells = [cell for cell in cells if cell.col_idx not in skip_col_idxs]
+        self.stats['literal_columns_skipped'] += len(skip_col_idxs)
+        self.stats['literal_cells_skipped'] += len(cells) - len(remaining_cells)
+        return remaining_cells
+
+    # find the top <n> entities for each of the cell contents `contents',
+    # returns lists of their URIs and normalized frequencies
+    def link_many(self, contents):
+        # query the backend for the (ranked) entities of the cell contents
+        ranked_many = self.backend.query_ranked_many(contents)
+        self.stats['backend_queries'] += len(contents)
+
+        res = []
+        for content, ranked in zip(contents, ranked_many):
+            if self.fuzzy[0] and len(ranked) == 0:
+                ranked = rank_entities(self.backend.fuzzy_search(content, fuzzy_cutoff=self.fuzzy[1]))
+                self.stats['fuzzy_searches'] += 1
+
+            # get top <n> results
+            res.append([
+                (uri.long(), normalized_frequency)
+                for uri, normalized_frequency in ranked[:self.top_n]
+            ])
+
+        return res
+
 # EntityLinkingBackend interface
 class EntityLinkingBackend(metaclass=ABCMeta):
     # EntityLinkingBackend's must implement a `query' method
     @abstractmethod
     def query(self, mention): pass
 
+    # the mention's entities as returned by `rank_entities'. Backends that
+    # store merged entities (see `read_index_merged') override this
+    def query_ranked(self, mention):
+        return rank_entities(self.query(mention))
+
+    # batch versions of `query' and `query_ranked' (list of mentions, returns
+    # a list of results). Backends that can look up many mentions at once
+    # (e.g. with a single database query) override them
+    def query_many(self, mentions):
+        return [self.query(mention) for mention in mentions]
+
+    def query_ranked_many(self, mentions):
+        return [rank_entities(res) for res in self.query_many(mentions)]
+
 # CSV backend
+#
+# The index maps preprocessed mentions to their merged entities (see
+# `read_index_merged'): one (URI, frequency) per distinct URI, sorted by
+# frequency
 class EntityLinkingBackendCSV(EntityLinkingBackend):
     def __init__(self, index_file, delimiter='\t', quotechar=None):
-        # index dictionary
-        self.index = defaultdict(list)
-
         # read complete `index_file` into the index dictionary
-        with io.open(index_file, 'r', encoding='utf-8', errors='ignore') as index_fh:
-            csv_reader = csv.reader(index_fh, delimiter=delimiter, quotechar=quotechar)
-            for row in csv_reader:
-                mention, uri, frequency = row
-                mention = preprocess_mention(mention)
-                if mention:
-                    uri = URI.parse(uri, 'dbr')
-                    self.index[mention].append((uri, int(frequency)))
+        self.index = read_index_merged(index_file, delimiter, quotechar)
 
     def query(self, mention):
         mention = preprocess_mention(mention)
@@ -129,15 +367,293 @@ class EntityLinkingBackendCSV(EntityLinkingBackend):
         except KeyError:
             return []
 
+    # the index's mentions in a `FuzzyIndex' (built on first use)
+    def fuzzy_index(self):
+        try:
+            return self._fuzzy_index
+        except AttributeError:
+            self._fuzzy_index = FuzzyIndex(self.index.keys())
+            return self._fuzzy_index
+
+    def query_ranked(self, mention):
+        return normalize_entities(self.query(mention))
+
+    def query_ranked_many(self, mentions):
+        return [self.query_ranked(mention) for mention in mentions]
+
+    def fuzzy_search(self, mention, fuzzy_cutoff=1):
+        mention = preprocess_mention(mention)
+        res = []
+
+        fuzzy_index = self.fuzzy_index()
+        for mention_idx in fuzzy_index.search(mention, fuzzy_cutoff):
+            res.extend(self.index[fuzzy_index.mentions[mention_idx]])
+
+        return res
+
+# binary backend
+#
+# Same as the CSV backend, but loads a precompiled index (see `build') with
+# preprocessed mentions, parsed URIs and merged entities
+class EntityLinkingBackendBinary(EntityLinkingBackendCSV):
+    index_format = 'EntityLinking/4'
+
+    def __init__(self, index_file):
+        self.index = load_binary_index(index_file, self.index_format)
+
+    # convert a TSV index (as read by the CSV backend) to a binary index file
+    @classmethod
+    def build(cls, index_file, output_file, delimiter='\t', quotechar=None):
+        backend = EntityLinkingBackendCSV(index_file, delimiter, quotechar)
+        dump_binary_index(backend.index, cls.index_format, output_file)
+
+# memory-mapped backend
+#
+# Reads a read-only on-disk hash table (see `build') via mmap, so the index is
+# not copied into each worker process. All workers share the same pages of the
+# operating system's page cache.
+#
+# file layout (all integers little endian):
+#   header:  magic (8 bytes), number of slots (uint64), number of mentions (uint64)
+#   slots:   hash table of record offsets (uint64, 0: empty slot), collisions
+#            are resolved by linear probing
+#   records: mention length (uint32), number of entries (uint32), mention (utf-8),
+#            followed by the entries: URI length (uint32), frequency (uint64),
+#            URI in short form (utf-8). Records are stored in index file order,
+#            entries are merged (see `read_index_merged')
+class EntityLinkingBackendMMap(EntityLinkingBackend):
+    magic = b'WTUELMM2'
+    header = struct.Struct('<8sQQ')
+    slot = struct.Struct('<Q')
+    record = struct.Struct('<II')
+    entry = struct.Struct('<IQ')
+
+    def __init__(self, index_file):
+        with io.open(index_file, 'rb') as index_fh:
+            self.mm = mmap.mmap(index_fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.n_slots, self.n_mentions = self.header.unpack_from(self.mm, 0)
+        if magic != self.magic:
+            raise Exception('"{:s}" is not a mmap entity linking index!'.format(index_file))
+        self.records_start = self.header.size + self.n_slots * self.slot.size
+
+    @classmethod
+    def hash_slot(cls, mention_bytes, n_slots):
+        return zlib.crc32(mention_bytes) % n_slots
+
+    # convert a TSV index (as read by the CSV backend) to a mmap index file
+    @classmethod
+    def build(cls, index_file, output_file, delimiter='\t', quotechar=None):
+        index = read_index_merged(index_file, delimiter, quotechar)
+
+        # keep the hash table at most half full
+        n_slots = 2 * len(index) + 1
+        slots = [0] * n_slots
+
+        with io.open(output_file, 'wb') as out_fh:
+            out_fh.write(cls.header.pack(cls.magic, n_slots, len(index)))
+
+            # write records, insert their offsets into the hash table
+            position = cls.header.size + n_slots * cls.slot.size
+            out_fh.seek(position)
+            for mention, entries in index.items():
+                mention_bytes = mention.encode('utf-8')
+                chunks = [cls.record.pack(len(mention_bytes), len(entries)), mention_bytes]
+                for uri, frequency in entries:
+                    uri_bytes = uri.short().encode('utf-8')
+                    chunks.append(cls.entry.pack(len(uri_bytes), frequency))
+                    chunks.append(uri_bytes)
+
+                slot_idx = cls.hash_slot(mention_bytes, n_slots)
+                while slots[slot_idx]:
+                    slot_idx = (slot_idx + 1) % n_slots
+                slots[slot_idx] = position
+
+                record = b''.join(chunks)
+                out_fh.write(record)
+                position += len(record)
+
+            # write hash table
+            out_fh.seek(cls.header.size)
+            out_fh.write(b''.join(map(cls.slot.pack, slots)))
+
+    # parse the record at `position', returns the mention (bytes), the
+    # position of its first entry and the number of entries
+    def read_record(self, position):
+        mention_len, n_entries = self.record.unpack_from(self.mm, position)
+        position += self.record.size
+        mention_bytes = self.mm[position:position+mention_len]
+        return mention_bytes, position + mention_len, n_entries
+
+    # parse `n_entries' entries starting at `position', returns the entries
+    # and the position after the last entry
+    def read_entries(self, position, n_entries):
+        entries = []
+        for _ in range(n_entries):
+            uri_len, frequency = self.entry.unpack_from(self.mm, position)
+            position += self.entry.size
+            prefix, suffix = self.mm[position:position+uri_len].decode('utf-8').split(':', 1)
+            position += uri_len
+            entries.append((URI(prefix, suffix), frequency))
+        return entries, position
+
+    def skip_entries(self, position, n_entries):
+        for _ in range(n_entries):
+            uri_len, _ = self.entry.unpack_from(self.mm, position)
+            position += self.entry.size + uri_len
+        return position
+
+    def query(self, mention):
+        mention = preprocess_mention(mention)
+
+        if not mention:
+            return []
+
+        # probe the hash table until we find the mention or an empty slot
+        mention_bytes = mention.encode('utf-8')
+        slot_idx = self.hash_slot(mention_bytes, self.n_slots)
+        while True:
+            position = self.slot.unpack_from(self.mm, self.header.size + slot_idx * self.slot.size)[0]
+            if not position:
+                return []
+            record_mention, position, n_entries = self.read_record(position)
+            if record_mention == mention_bytes:
+                return self.read_entries(position, n_entries)[0]
+            slot_idx = (slot_idx + 1) % self.n_slots
+
+    def query_ranked(self, mention):
+        return normalize_entities(self.query(mention))
+
+    # all mentions in a `FuzzyIndex' (built on first use) and the positions
+    # of their entries
+    def fuzzy_index(self):
+        try:
+            return self._fuzzy_index
+        except AttributeError:
+            pass
+
+        mentions = []
+        self.entry_positions = []
+        position = self.records_start
+        end = len(self.mm)
+        while position < end:
+            record_mention, position, n_entries = self.read_record(position)
+            mentions.append(record_mention.decode('utf-8'))
+            self.entry_positions.append((position, n_entries))
+            position = self.skip_entries(position, n_entries)
+
+        self._fuzzy_index = FuzzyIndex(mentions)
+        return self._fuzzy_index
+
+    def fuzzy_search(self, mention, fuzzy_cutoff=1):
+        mention = preprocess_mention(mention)
+        res = []
+
+        for mention_idx in self.fuzzy_index().search(mention, fuzzy_cutoff):
+            res.extend(self.read_entries(*self.entry_positions[mention_idx])[0])
+
+        return res
+
+# SQLite backend
+#
+# Queries an SQLite database (see `build') instead of loading the index into
+# memory. Mentions are stored preprocessed in index file order, URIs in short
+# form, merged (see `read_index_merged').
+class EntityLinkingBackendSQLite(EntityLinkingBackend):
+    index_format = 'EntityLinking/sqlite2'
+
+    def __init__(self, index_file):
+        self.index = SQLiteIndex(index_file, self.index_format)
+
+    # convert a TSV index (as read by the CSV backend) to an SQLite index file
+    @classmethod
+    def build(cls, index_file, output_file, delimiter='\t', quotechar=None):
+        conn = create_sqlite_index(output_file, cls.index_format)
+        conn.execute('CREATE TABLE mentions (id INTEGER PRIMARY KEY, mention TEXT NOT NULL UNIQUE)')
+        conn.execute('CREATE TABLE entities (mention_id INTEGER NOT NULL, uri TEXT NOT NULL, frequency INTEGER NOT NULL)')
+
+        index = read_index_merged(index_file, delimiter, quotechar)
+        conn.executemany('INSERT INTO mentions VALUES (?, ?)', (
+            (mention_id, mention)
+            for mention_id, mention in enumerate(index, 1)
+        ))
+        conn.executemany('INSERT INTO entities VALUES (?, ?, ?)', (
+            (mention_id, uri.short(), frequency)
+            for mention_id, entities in enumerate(index.values(), 1)
+            for uri, frequency in entities
+        ))
+        conn.execute('CREATE INDEX entities_mention_id ON entities (mention_id)')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def parse_entities(rows):
+        return [
+            (URI(*uri.split(':', 1)), frequency)
+            for uri, frequency in rows
+        ]
+
+    def query(self, mention):
+        mention = preprocess_mention(mention)
+
+        if not mention:
+            return []
+
+        return self.parse_entities(self.index.connection().execute(
+            'SELECT uri, frequency FROM mentions JOIN entities ON mention_id = id '
+            'WHERE mention = ? ORDER BY entities.rowid',
+            (mention,)
+        ))
+
+    def query_many(self, mentions):
+        mentions = mention_normalizer.normalize_many(mentions)
+
+        entities = defaultdict(list)
+        for mention, uri, frequency in self.index.select_in(
+            'SELECT mention, uri, frequency FROM mentions JOIN entities ON mention_id = id '
+            'WHERE mention IN ({keys}) ORDER BY entities.rowid',
+            list(set(mention for mention in mentions if mention))
+        ):
+            entities[mention].append((uri, frequency))
+
+        return [
+            self.parse_entities(entities.get(mention, []))
+            for mention in mentions
+        ]
+
+    def query_ranked(self, mention):
+        return normalize_entities(self.query(mention))
+
+    def query_ranked_many(self, mentions):
+        return [normalize_entities(entities) for entities in self.query_many(mentions)]
+
+    # all mentions in a `FuzzyIndex' (built on first use)
+    def fuzzy_index(self):
+        try:
+            return self._fuzzy_index
+        except AttributeError:
+            self._fuzzy_index = FuzzyIndex(
+                mention for mention, in self.index.connection().execute(
+                    'SELECT mention FROM mentions ORDER BY id'
+                )
+            )
+            return self._fuzzy_index
+
     def fuzzy_search(self, mention, fuzzy_cutoff=1):
         mention = preprocess_mention(mention)
         res = []
 
-        for index_mention, index_data in self.index.items():
-            if levenshtein_similarity(mention, index_mention) >= fuzzy_cutoff:
-                res.extend(index_data)
+        conn = self.index.connection()
+        for mention_idx in self.fuzzy_index().search(mention, fuzzy_cutoff):
+            res.extend(self.parse_entities(conn.execute(
+                'SELECT uri, frequency FROM entities WHERE mention_id = ? ORDER BY rowid',
+                (mention_idx + 1,)
+            )))
 
         return res
 
 # register backends with the EntityLinking main class
 EntityLinking.register_backend('csv', EntityLinkingBackendCSV)
+EntityLinking.register_backend('binary', EntityLinkingBackendBinary)
+EntityLinking.register_backend('mmap', EntityLinkingBackendMMap)
+EntityLinking.register_backend('sqlite', EntityLinkingBackendSQLite)
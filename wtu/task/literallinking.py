@@ -1,13 +1,21 @@
 from abc import ABCMeta, abstractmethod
-from collections import defaultdict
-import io, csv
+from collections import defaultdict, namedtuple, Counter
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+import io, sys, csv, math
 import Levenshtein
 import re
 import string
 
-from wtu.task import Task
+# numpy is optional (only needed for `LiteralLinking(vectorize=True)')
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from wtu.task import Task, CachedBackend, LRUCache
 from wtu.table import Table
-from wtu.util import URI
+from wtu.util import URI, dump_binary_index, load_binary_index, create_sqlite_index, SQLiteIndex, bounded_levenshtein_similarity
 
 # utility functions
 
@@ -15,12 +23,16 @@ from wtu.util import URI
 #
 # >>> print(string.punctuation)
 # !"#$%&'()*+,-./:;<=>?@[\]^_`{|}~
+punctuation_table = str.maketrans('', '', string.punctuation)
+
 def string_remove_punctuation(the_string):
-    return the_string.translate(str.maketrans('', '', string.punctuation))
+    return the_string.translate(punctuation_table)
 
 # remove parentheses and their contents
+parens_re = re.compile(r'\([^)]*\)')
+
 def string_remove_parens(the_string):
-    return re.sub(r'\([^)]*\)', '', the_string)
+    return parens_re.sub('', the_string)
 
 # Levenshtein similarity. Between 0 and 1
 # 0: completely differnt
@@ -42,6 +54,153 @@ def metric_weighted_difference(num_a, num_b):
     else:
         return 0.0
 
+# `metric_weighted_difference' of each of `numbers' (rows) and each of
+# `values' (columns) as a numpy matrix
+def vectorized_weighted_difference(numbers, values):
+    num_a = numpy.asarray(values, dtype=float)[numpy.newaxis, :]
+    num_b = numpy.asarray(numbers, dtype=float)[:, numpy.newaxis]
+    high, low = numpy.maximum(num_a, num_b), numpy.minimum(num_a, num_b)
+    with numpy.errstate(all='ignore'):
+        scores = 1 - numpy.abs((high-low)/high)
+    scores = numpy.where((num_a != 0) & (num_b != 0), scores, 0.0)
+    return numpy.where(num_a == num_b, 1.0, scores)
+
+default_numeric_metrics = {'weighted_difference': metric_weighted_difference}
+default_string_metrics = {'levenshtein': metric_levenshtein_similarity}
+
+# long form of a (short or long) URI
+@lru_cache(maxsize=4096)
+def expand_uri(uri):
+    return URI.parse(uri).long()
+
+# A literal of the literal linking index, parsed when the index is loaded:
+#   property_uri: property URI (as in the index)
+#   type:         literal type (as in the index)
+#   value:        literal value
+#   number:       the value as a float (None if it is not a number)
+#   type_uri:     long form of the literal type ('' if there is none, None if
+#                 it can't be parsed)
+Literal = namedtuple('Literal', ['property_uri', 'type', 'value', 'number', 'type_uri'])
+
+def make_literal(property_uri, literal_type, literal_value, number=None):
+    if number is None:
+        try:
+            number = float(literal_value)
+        except ValueError:
+            pass
+
+    type_uri = ''
+    if len(literal_type) > 0:
+        try:
+            type_uri = expand_uri(literal_type)
+        except Exception:
+            type_uri = None
+
+    return Literal(sys.intern(property_uri), sys.intern(literal_type), literal_value, number, type_uri)
+
+# An entity's properties (list of `Literal's), bucketed by value for
+# matching them against cell values:
+# - values in a hash (dates are matched by their exact value)
+# - numeric values sorted (range lookups for the weighted difference)
+# - all values sorted by length (range lookups for string similarity)
+class PropertyIndex:
+    def __init__(self, properties):
+        self.properties = properties
+
+        self.by_value = defaultdict(list)
+        numbers = []
+        lengths = []
+        for property_idx, literal in enumerate(properties):
+            self.by_value[literal.value].append(property_idx)
+            lengths.append((len(literal.value), property_idx))
+            # NaN never matches
+            number = literal.number
+            if number is not None and number == number:
+                numbers.append((number, property_idx))
+
+        numbers.sort()
+        self.numbers = [number for number, _ in numbers]
+        self.number_property_idxs = [property_idx for _, property_idx in numbers]
+        lengths.sort()
+        self.lengths = [length for length, _ in lengths]
+        self.length_property_idxs = [property_idx for _, property_idx in lengths]
+
+        # numeric values as a numpy array (see `weighted_differences')
+        self.number_array = None
+
+    # properties with the value `value'
+    def equal(self, value):
+        return self.by_value.get(value, [])
+
+    # numeric properties whose `metric_weighted_difference' to `number'
+    # may be at least `cutoff'
+    def numbers_near(self, number, cutoff):
+        if cutoff <= 0:
+            return self.number_property_idxs
+        if cutoff > 1 or number != number:
+            return []
+
+        # weighted difference >= cutoff requires the same sign and
+        # cutoff*number <= value <= number/cutoff for positive numbers,
+        # (2-cutoff)*number <= value <= number/(2-cutoff) for negative
+        # numbers (zero and infinity only match themselves)
+        if number == 0 or math.isinf(number):
+            low = high = number
+        elif number > 0:
+            low, high = cutoff * number, number / cutoff
+        else:
+            low, high = (2 - cutoff) * number, number / (2 - cutoff)
+        # (float rounding)
+        low -= abs(low) * 1e-9
+        high += abs(high) * 1e-9
+
+        return self.number_property_idxs[
+            bisect_left(self.numbers, low):bisect_right(self.numbers, high)
+        ]
+
+    # `metric_weighted_difference' of each of `numbers' to all numeric
+    # properties at once (requires numpy). Returns a dictionary number ->
+    # {property index: score} of the scores of at least `cutoff'
+    def weighted_differences(self, numbers, cutoff):
+        # (NaN never matches)
+        numbers = [number for number in numbers if number == number]
+        if not numbers or not self.numbers:
+            return {}
+        if self.number_array is None:
+            self.number_array = numpy.array(self.numbers, dtype=float)
+
+        scores = vectorized_weighted_difference(numbers, self.number_array)
+        res = {}
+        for number, number_scores in zip(numbers, scores):
+            matching = numpy.flatnonzero(number_scores >= cutoff)
+            res[number] = {
+                self.number_property_idxs[value_idx]: float(number_scores[value_idx])
+                for value_idx in matching.tolist()
+            }
+        return res
+
+    # properties whose values' length allows a Levenshtein similarity of at
+    # least `cutoff' to a string of length `min_length'..`max_length'
+    def lengths_near(self, min_length, max_length, cutoff):
+        if cutoff <= 0:
+            return self.length_property_idxs
+        low = cutoff * min_length * (1 - 1e-9)
+        high = max_length / cutoff * (1 + 1e-9)
+
+        return self.length_property_idxs[
+            bisect_left(self.lengths, low):bisect_right(self.lengths, high)
+        ]
+
+# read a literal linking index in TSV format (entity URI, property URI,
+# literal type, literal value) and yield its entries with parsed entity URIs
+def read_index_csv(index_file, delimiter='\t', quotechar=None):
+    with io.open(index_file, 'r', encoding='utf-8', errors='ignore') as index_fh:
+        csv_reader = csv.reader(index_fh, delimiter=delimiter, quotechar=quotechar)
+        for row in csv_reader:
+            entity_uri, property_uri, literal_type, literal_value = row
+            entity_uri = URI.parse(entity_uri, 'dbr')
+            yield entity_uri, property_uri, literal_type, literal_value
+
 class LiteralLinking(Task):
     backends_available = {}
 
@@ -49,10 +208,18 @@ class LiteralLinking(Task):
     def register_backend(cls, name, backend):
         cls.backends_available[name] = backend
 
-    def __init__(self, backend):
+    def __init__(self, backend, cache=None, vectorize=False, entity_cache=None, sample=None):
         # instantiate backend
         backend_name, backend_args = backend
         self.backend = LiteralLinking.backends_available[backend_name](**backend_args)
+        # cache backend results across tables (LRU, `cache' results per process)
+        if cache:
+            self.backend = CachedBackend(self.backend, cache, self)
+        # cache the entities' prepared properties (`PropertyIndex') across
+        # tables (LRU, `entity_cache' entities per process)
+        self.entity_cache = None
+        if entity_cache:
+            self.entity_cache = LRUCache(entity_cache, self, 'entity_cache')
 
         # string transformations and metrics
         self.string_transformations = {
@@ -89,10 +256,23 @@ class LiteralLinking(Task):
         }
         self.numeric_metric_cutoff_below = .5
 
+        # compare all numbers of a row with all of an entity's numeric
+        # properties at once (see `PropertyIndex.weighted_differences')
+        if vectorize and numpy is None:
+            raise Exception('LiteralLinking: "vectorize" requires numpy!')
+        self.vectorize = vectorize
+
+        # sampling: [number of rows, threshold]. Tables with more rows are
+        # matched exhaustively only on their first rows. On the other rows
+        # only the combinations of entity column, other column and property
+        # are matched that were found in at least `threshold' of the first
+        # rows with entities in the entity column (see `run')
+        self.sample = sample
+
+    # (`property_value' is the property's value as a float, None if it is
+    # not a number)
     def match_numeric(self, property_value, number):
-        try:
-            property_value = float(property_value)
-        except ValueError:
+        if property_value is None:
             return []
 
         metric_scores = {
@@ -106,10 +286,9 @@ class LiteralLinking(Task):
         else:
             return []
 
+    # (`property_value' as for `match_numeric')
     def match_value_unit(self, property_value, value, value_normalized):
-        try:
-            property_value = float(property_value)
-        except ValueError:
+        if property_value is None:
             return []
 
         metric_scores = {
@@ -134,6 +313,26 @@ class LiteralLinking(Task):
 
         return transformations
 
+    # `match_numeric' and `match_value_unit' with precomputed metric scores
+    # (`scores': number -> {property index: score}, see
+    # `PropertyIndex.weighted_differences')
+    def match_numeric_scores(self, property_idx, anno, scores):
+        if anno['type'] == 'numeric':
+            numbers = [(None, anno['number'])]
+        else:
+            numbers = [(None, anno['value'])]
+            if anno['value_normalized'] != anno['value']:
+                numbers.append(('value_normalized', anno['value_normalized']))
+
+        transformations = []
+        for transformation_name, number in numbers:
+            score = scores.get(number, {}).get(property_idx)
+            if score is not None:
+                transformations.append(
+                    (transformation_name, {'weighted_difference': score})
+                )
+        return transformations
+
     def match_date(self, property_type, property_value, date_parts):
         transformations = []
 
@@ -158,144 +357,380 @@ class LiteralLinking(Task):
 
         return transformations
 
-    def match_string(self, property_value, cell_content):
+    # the string transformed by each of the transformation sequences, as a
+    # list of (transformation sequence, transformed string). Sequences with
+    # a common prefix share its intermediate result
+    def string_variants(self, the_string):
+        transformed = {(): the_string}
+        variants = []
+        for transformation_seq in self.string_transformation_seqs:
+            seq = tuple(transformation_seq)
+            if seq not in transformed:
+                prefix_len = len(seq) - 1
+                while seq[:prefix_len] not in transformed:
+                    prefix_len -= 1
+                transformed_string = transformed[seq[:prefix_len]]
+                for seq_idx in range(prefix_len, len(seq)):
+                    transformed_string = self.string_transformations[seq[seq_idx]](transformed_string)
+                    transformed[seq[:seq_idx+1]] = transformed_string
+            variants.append((transformation_seq, transformed[seq]))
+        return variants
+
+    def match_string(self, property_value, cell_content, variants=None):
         transformations = []
         previous_min_score = 0
 
-        # try all transformation sequences
-        for transformation_seq in self.string_transformation_seqs:
-            transformed_cell_content = cell_content
-            # apply all transformations in the transformation sequence
-            for transformation_name in transformation_seq:
-                transformation = self.string_transformations[transformation_name]
-                transformed_cell_content = transformation(transformed_cell_content)
+        if variants is None:
+            variants = self.string_variants(cell_content)
 
+        # the default metric is only calculated as far as needed to tell
+        # whether it reaches the cutoff (see `bounded_levenshtein_similarity')
+        bounded = self.string_metrics == default_string_metrics
+
+        # try all transformation sequences (the metrics are calculated only
+        # once for each distinct transformed string)
+        metric_scores_by_string = {}
+        for transformation_seq, transformed_cell_content in variants:
             # calculate metrics for the transformed string
-            metric_scores = {
-                metric_name: metric(property_value, transformed_cell_content)
-                for metric_name, metric in self.string_metrics.items()
-            }
+            try:
+                metric_scores = metric_scores_by_string[transformed_cell_content]
+            except KeyError:
+                if bounded:
+                    score = bounded_levenshtein_similarity(property_value, transformed_cell_content, self.string_metric_cutoff_below)
+                    # (None: below the cutoff)
+                    metric_scores = None if score is None else {'levenshtein': score}
+                else:
+                    metric_scores = {
+                        metric_name: metric(property_value, transformed_cell_content)
+                        for metric_name, metric in self.string_metrics.items()
+                    }
+                metric_scores_by_string[transformed_cell_content] = metric_scores
+            if metric_scores is None:
+                continue
 
             # if any of the metric's scores is above 'string_metric_cutoff_below' and also higher
             # than the minimal score from the previous transformation, add the transformation and
             # metric scores to the list of matching transformations
             if any(map(lambda s: s >= self.string_metric_cutoff_below and s > previous_min_score, metric_scores.values())):
-                transformations.append((transformation_seq, metric_scores))
+                transformations.append((transformation_seq, dict(metric_scores)))
                 previous_min_score = min(metric_scores.values())
 
         return transformations
 
-    def match_properties(self, cell, properties):
+    # the cell's LiteralNormalization annotations, prepared for matching them
+    # against properties: list of (annotation index, annotation, prepared
+    # values). Computed once per cell and table (see `run')
+    def cell_literals(self, cell):
+        literals = []
+        cell_annotations = cell.annotations
+        for anno_idx in cell.find_annotation_indices(anno_task='LiteralNormalization'):
+            anno = cell_annotations[anno_idx]
+            ln_type = anno['type']
+            prepared = {}
+            if ln_type == 'date':
+                prepared['date_parts'] = {
+                    k: anno[k]
+                    for k in ['year', 'month', 'day_of_month']
+                }
+            elif ln_type == 'plain':
+                prepared['variants'] = self.string_variants(anno['string'])
+            literals.append((anno_idx, anno, prepared))
+        return literals
+
+    # the properties (indices into `property_index.properties') that may
+    # match the LiteralNormalization annotation `anno', i.e. a superset of
+    # the properties the `match_*' methods find matching transformations for
+    def candidate_properties(self, property_index, anno, prepared, numeric_scores=None):
+        ln_type = anno['type']
+
+        if ln_type == 'date':
+            # dates only match properties with exactly the formatted value
+            date_parts = (anno['year'], anno['month'], anno['day_of_month'])
+            candidates = set()
+            for transformation_pattern in self.date_transformations.values():
+                candidates.update(property_index.equal(transformation_pattern.format(*date_parts)))
+            for transformation_pattern in self.date_transformations_gYear.values():
+                candidates.update(property_index.equal(transformation_pattern.format(date_parts[0])))
+            return candidates
+
+        elif ln_type in ('numeric', 'value and unit'):
+            if self.numeric_metrics != default_numeric_metrics:
+                return range(len(property_index.properties))
+            if ln_type == 'numeric':
+                numbers = [anno['number']]
+            else:
+                numbers = [anno['value'], anno['value_normalized']]
+            candidates = set()
+            for number in numbers:
+                if numeric_scores is not None:
+                    candidates.update(numeric_scores.get(number, ()))
+                else:
+                    candidates.update(property_index.numbers_near(number, self.numeric_metric_cutoff_below))
+            return candidates
+
+        elif ln_type == 'plain':
+            if self.string_metrics != default_string_metrics:
+                return range(len(property_index.properties))
+            lengths = [len(variant) for _, variant in prepared['variants']]
+            return property_index.lengths_near(min(lengths), max(lengths), self.string_metric_cutoff_below)
+
+        return []
+
+    # (`numeric_scores': precomputed scores of the cell's numbers, see
+    # `numeric_scores'. `property_uris': only match these properties)
+    def match_properties(self, cell, properties, property_index=None, literals=None, numeric_scores=None, property_uris=None):
         matching_properties = defaultdict(list)
 
-        # iterate over all properties
-        for property_uri, property_type, property_value in properties:
-            for anno_idx, anno in enumerate(cell.annotations):
-                # iterate over the cell's LiteralNormalization annotations (if it has any)
-                # and use the normalized cell value for comparisons against the index
-                if anno['task'] == 'LiteralNormalization':
-                    ln_anno_idx = '{:d}:{:d}/{:d}'.format(*cell.idx, anno_idx)
-                    ln_type = anno['type']
-                    transformations = []
-
-                    # distinguish between the different kinds of LiteralNormalization annotations
-                    # and collect their transformations/metric scores
-
-                    if ln_type == 'date':
-                        date_parts = {
-                            k: anno[k]
-                            for k in ['year', 'month', 'day_of_month']
-                        }
-                        transformations = self.match_date(property_type, property_value, date_parts)
-
-                    elif ln_type == 'numeric':
-                        transformations = self.match_numeric(property_value, anno['number'])
-
-                    elif ln_type == 'value and unit':
-                        transformations = self.match_value_unit(property_value, anno['value'], anno['value_normalized'])
-
-                    elif ln_type == 'plain':
-                        transformations = self.match_string(property_value, anno['string'])
-
-                    if transformations:
-                        index_type = ''
-                        if len(property_type) > 0:
-                            index_type = URI.parse(property_type).long()
-
-                        matching_properties[property_uri].append({
-                            'references_ln': ln_anno_idx,
-                            'transformations': transformations,
-                            'index_value': property_value,
-                            'index_type': index_type,
-                        })
+        # the cell's LiteralNormalization annotations (if it has any)
+        if literals is None:
+            literals = self.cell_literals(cell)
+        if not literals:
+            return matching_properties
+
+        if property_index is None:
+            property_index = PropertyIndex(properties)
+
+        # only compare each annotation with the properties that may match it
+        # (see `candidate_properties'), sorted to keep the order of
+        # properties and annotations
+        candidates = sorted(
+            (property_idx, literal_idx)
+            for literal_idx, (anno_idx, anno, prepared) in enumerate(literals)
+            for property_idx in self.candidate_properties(property_index, anno, prepared, numeric_scores)
+            if property_uris is None or properties[property_idx].property_uri in property_uris
+        )
+        self.stats['candidate_properties'] += len(candidates)
+
+        for property_idx, literal_idx in candidates:
+            literal = properties[property_idx]
+            property_uri, property_type, property_value = literal.property_uri, literal.type, literal.value
+            # use the cell's normalized value for comparisons against the index
+            anno_idx, anno, prepared = literals[literal_idx]
+            ln_anno_idx = '{:d}:{:d}/{:d}'.format(*cell.idx, anno_idx)
+            ln_type = anno['type']
+            transformations = []
+
+            # distinguish between the different kinds of LiteralNormalization annotations
+            # and collect their transformations/metric scores
+
+            if ln_type == 'date':
+                transformations = self.match_date(property_type, property_value, prepared['date_parts'])
+
+            elif numeric_scores is not None and ln_type in ('numeric', 'value and unit'):
+                transformations = self.match_numeric_scores(property_idx, anno, numeric_scores)
+
+            elif ln_type == 'numeric':
+                transformations = self.match_numeric(literal.number, anno['number'])
+
+            elif ln_type == 'value and unit':
+                transformations = self.match_value_unit(literal.number, anno['value'], anno['value_normalized'])
+
+            elif ln_type == 'plain':
+                transformations = self.match_string(property_value, anno['string'], prepared['variants'])
+
+            if transformations:
+                index_type = literal.type_uri
+                if index_type is None:
+                    # (raises the parsing error)
+                    index_type = URI.parse(property_type).long()
+
+                matching_properties[property_uri].append({
+                    'references_ln': ln_anno_idx,
+                    'transformations': transformations,
+                    'index_value': property_value,
+                    'index_type': index_type,
+                })
 
         return matching_properties
 
+    # metric scores of all numbers in the cells' LiteralNormalization
+    # annotations (`literals', see `cell_literals') against the entity's
+    # numeric properties, computed at once. None if not vectorized
+    def numeric_scores(self, property_index, literals):
+        if not self.vectorize or self.numeric_metrics != default_numeric_metrics:
+            return None
+
+        numbers = []
+        for anno_idx, anno, prepared in literals:
+            if anno['type'] == 'numeric':
+                numbers.append(anno['number'])
+            elif anno['type'] == 'value and unit':
+                numbers.extend([anno['value'], anno['value_normalized']])
+
+        return property_index.weighted_differences(list(dict.fromkeys(numbers)), self.numeric_metric_cutoff_below)
+
+    # the properties of each of `entity_uris' (`PropertyIndex', None if the
+    # entity has no properties) as a dictionary
+    def property_indexes(self, entity_uris):
+        property_indexes = {}
+        missing_uris = []
+        for entity_uri in entity_uris:
+            if self.entity_cache is not None:
+                try:
+                    property_indexes[entity_uri] = self.entity_cache.get(entity_uri)
+                    continue
+                except KeyError:
+                    pass
+            missing_uris.append(entity_uri)
+
+        # query the backend for the properties of all other entities at once
+        if missing_uris:
+            self.stats['backend_queries'] += len(missing_uris)
+            for entity_uri, properties in zip(missing_uris, self.backend.query_many(missing_uris)):
+                property_index = PropertyIndex(properties) if properties else None
+                if self.entity_cache is not None:
+                    self.entity_cache.put(entity_uri, property_index)
+                property_indexes[entity_uri] = property_index
+
+        return property_indexes
+
+    # the cell's prepared LiteralNormalization annotations (see
+    # `cell_literals'), computed once per table (`cell_literals_by_cell')
+    def cached_cell_literals(self, cell, cell_literals_by_cell):
+        try:
+            return cell_literals_by_cell[cell.idx]
+        except KeyError:
+            literals = cell_literals_by_cell[cell.idx] = self.cell_literals(cell)
+            return literals
+
+    # match the cells of `row' against the properties of the entities in its
+    # `el_cells'. `combinations': only match these properties for each
+    # (entity column, other column) (see `sample'). Returns the (entity
+    # column, other column, property URI) combinations found
+    def match_row(self, row, el_cells, property_indexes, cell_literals_by_cell, combinations=None):
+        found = set()
+
+        # iterate over all 'entity' cells
+        for el_cell, el_annos in el_cells:
+            # iterate over all EL annotations of this cell
+            for el_anno_idx, el_anno in el_annos:
+                # the set of this entitie's properties,
+                # skip this entity if there are none
+                property_index = property_indexes[el_anno['resource_uri']]
+                if property_index is None:
+                    continue
+                properties = property_index.properties
+                # (all of the row's numbers at once)
+                numeric_scores = self.numeric_scores(property_index, [
+                    literal
+                    for other_cell in row
+                    if other_cell.idx != el_cell.idx
+                    for literal in self.cached_cell_literals(other_cell, cell_literals_by_cell)
+                ]) if self.vectorize else None
+
+                # iterate over all other cells in this row
+                # i.e. not the one containing the entity
+                for other_cell in row:
+                    if other_cell.idx == el_cell.idx:
+                        continue
+
+                    property_uris = None
+                    if combinations is not None:
+                        property_uris = combinations.get((el_cell.col_idx, other_cell.col_idx))
+                        if not property_uris:
+                            self.stats['cell_matches_skipped'] += 1
+                            continue
+
+                    # try to match the cell's content with one of
+                    # the entity's properties
+                    matching_properties = self.match_properties(
+                        other_cell, properties, property_index,
+                        self.cached_cell_literals(other_cell, cell_literals_by_cell),
+                        numeric_scores, property_uris
+                    )
+                    self.stats['cell_matches'] += 1
+                    for property_uri, match_infos in matching_properties.items():
+                        found.add((el_cell.col_idx, other_cell.col_idx, property_uri))
+                        property_uri = expand_uri(property_uri)
+                        for match_info in match_infos:
+                            other_cell.annotations.append({
+                                'source': 'preprocessing',
+                                'task': 'LiteralLinking',
+                                'type': 'property',
+                                'property_uri': property_uri,
+                                'references_el': '{:d}:{:d}/{:d}'.format(*el_cell.idx, el_anno_idx),
+                                **match_info
+                            })
+
+        return found
+
     def run(self, table):
-        # iterate over all rows
+        # find all 'entity' cells in each row
+        rows = []
         for row in table.rows():
-            # find all 'entity' cell in the current row
             el_cells = []
             for cell in row:
-                # el_annos = cell.find_annotations(anno_source='preprocessing', anno_task='EntityLinking')
-                # if el_annos:
-                #     el_cells.append((cell, el_annos))
-                el_annos = []
-                for cell_anno_idx, cell_anno in enumerate(cell.annotations):
-                    if cell_anno['source'] == 'preprocessing' and cell_anno['task'] == 'EntityLinking':
-                        el_annos.append((cell_anno_idx, cell_anno))
+                el_annos = [
+                    (cell_anno_idx, cell.annotations[cell_anno_idx])
+                    for cell_anno_idx in cell.find_annotation_indices(anno_source='preprocessing', anno_task='EntityLinking')
+                ]
                 if el_annos:
                     el_cells.append((cell, el_annos))
+            rows.append((row, el_cells))
+
+        # the properties of all entities in the table
+        property_indexes = self.property_indexes(list(dict.fromkeys(
+            el_anno['resource_uri']
+            for row, el_cells in rows
+            for el_cell, el_annos in el_cells
+            for el_anno_idx, el_anno in el_annos
+        )))
+        # prepared LiteralNormalization annotations by cell
+        cell_literals_by_cell = {}
+
+        # match all rows (or only the sample, see `sample')
+        n_sample_rows = len(rows)
+        if self.sample is not None and len(rows) > self.sample[0]:
+            n_sample_rows = self.sample[0]
+
+        # number of rows each combination was found in and number of rows
+        # with entities per entity column
+        combination_rows = Counter()
+        el_column_rows = Counter()
+        for row, el_cells in rows[:n_sample_rows]:
+            combination_rows.update(self.match_row(row, el_cells, property_indexes, cell_literals_by_cell))
+            el_column_rows.update(set(el_cell.col_idx for el_cell, el_annos in el_cells))
+
+        # match only the combinations found often enough in the remaining rows
+        if n_sample_rows < len(rows):
+            combinations = defaultdict(set)
+            for (el_col_idx, col_idx, property_uri), n_rows in combination_rows.items():
+                if n_rows >= self.sample[1] * el_column_rows[el_col_idx]:
+                    combinations[(el_col_idx, col_idx)].add(property_uri)
+            self.stats['sampled_tables'] += 1
+            self.stats['combinations'] += sum(map(len, combinations.values()))
+
+            for row, el_cells in rows[n_sample_rows:]:
+                self.match_row(row, el_cells, property_indexes, cell_literals_by_cell, combinations)
 
-            # iterate over all 'entity' cells
-            for el_cell, el_annos in el_cells:
-                # iterate over all EL annotations of this cell
-                for el_anno_idx, el_anno in el_annos:
-                    # query the backend for the set of this entitie's properties,
-                    # skip this entity if there are none
-                    properties = self.backend.query(el_anno['resource_uri'])
-                    if not properties:
-                        continue
-
-                    # iterate over all other cells in this row
-                    # i.e. not the one containing the entity
-                    for other_cell in row:
-                        if other_cell.idx == el_cell.idx:
-                            continue
-
-                        # try to match the cell's content with one of
-                        # the entity's properties
-                        matching_properties = self.match_properties(other_cell, properties);
-                        for property_uri, match_infos in matching_properties.items():
-                            property_uri = URI.parse(property_uri)
-                            for match_info in match_infos:
-                                other_cell.annotations.append({
-                                    'source': 'preprocessing',
-                                    'task': 'LiteralLinking',
-                                    'type': 'property',
-                                    'property_uri': property_uri.long(),
-                                    'references_el': '{:d}:{:d}/{:d}'.format(*el_cell.idx, el_anno_idx),
-                                    **match_info
-                                })
         return True
 
+# LiteralLinkingBackend interface. `query' returns the entity's properties
+# as a list (or tuple) of `Literal's
 class LiteralLinkingBackend(metaclass=ABCMeta):
     @abstractmethod
     def query(self, entity_uri):
         pass
 
+    # batch version of `query' (list of entity URIs, returns a list of
+    # results). Backends that can look up many entities at once override it
+    def query_many(self, entity_uris):
+        return [self.query(entity_uri) for entity_uri in entity_uris]
+
 class LiteralLinkingBackendCSV(LiteralLinkingBackend):
     def __init__(self, index_file, delimiter='\t', quotechar=None):
         # index dictionary
         self.index = defaultdict(list)
 
         # read complete `index_file` into the index dictionary
-        with io.open(index_file, 'r', encoding='utf-8', errors='ignore') as index_fh:
-            csv_reader = csv.reader(index_fh, delimiter=delimiter, quotechar=quotechar)
-            for row in csv_reader:
-                entity_uri, property_uri, literal_type, literal_value = row
-                entity_uri = URI.parse(entity_uri, 'dbr')
-                self.index[entity_uri.short()].append((property_uri, literal_type, literal_value))
+        for entity_uri, property_uri, literal_type, literal_value in read_index_csv(index_file, delimiter, quotechar):
+            self.index[entity_uri.short()].append(make_literal(property_uri, literal_type, literal_value))
+
+        # (tuples are smaller than lists)
+        self.index = {
+            entity_uri: tuple(literals)
+            for entity_uri, literals in self.index.items()
+        }
 
     def query(self, entity_uri):
         entity_uri = URI.parse(entity_uri)
@@ -307,4 +742,72 @@ class LiteralLinkingBackendCSV(LiteralLinkingBackend):
 
         return res
 
+# binary backend
+#
+# Same as the CSV backend, but loads a precompiled index (see `build')
+class LiteralLinkingBackendBinary(LiteralLinkingBackendCSV):
+    index_format = 'LiteralLinking/2'
+
+    def __init__(self, index_file):
+        self.index = load_binary_index(index_file, self.index_format)
+
+    # convert a TSV index (as read by the CSV backend) to a binary index file
+    @classmethod
+    def build(cls, index_file, output_file, delimiter='\t', quotechar=None):
+        index = LiteralLinkingBackendCSV(index_file, delimiter, quotechar).index
+        dump_binary_index(index, cls.index_format, output_file)
+
+# SQLite backend
+#
+# Queries an SQLite database (see `build') instead of loading the index into
+# memory. Entity URIs are stored in short form, literals in index file order
+# (with their numeric value, if they have one).
+class LiteralLinkingBackendSQLite(LiteralLinkingBackend):
+    index_format = 'LiteralLinking/sqlite2'
+
+    def __init__(self, index_file):
+        self.index = SQLiteIndex(index_file, self.index_format)
+
+    # convert a TSV index (as read by the CSV backend) to an SQLite index file
+    @classmethod
+    def build(cls, index_file, output_file, delimiter='\t', quotechar=None):
+        conn = create_sqlite_index(output_file, cls.index_format)
+        conn.execute('CREATE TABLE literals (entity TEXT NOT NULL, property TEXT NOT NULL, type TEXT NOT NULL, value TEXT NOT NULL, number REAL)')
+        conn.executemany('INSERT INTO literals VALUES (?, ?, ?, ?, ?)', (
+            (entity_uri.short(), property_uri, literal_type, literal_value, make_literal(property_uri, literal_type, literal_value).number)
+            for entity_uri, property_uri, literal_type, literal_value in read_index_csv(index_file, delimiter, quotechar)
+        ))
+        conn.execute('CREATE INDEX literals_entity ON literals (entity)')
+        conn.commit()
+        conn.close()
+
+    def query(self, entity_uri):
+        entity_uri = URI.parse(entity_uri)
+
+        return [
+            make_literal(*row)
+            for row in self.index.connection().execute(
+                'SELECT property, type, value, number FROM literals WHERE entity = ? ORDER BY rowid',
+                (entity_uri.short(),)
+            )
+        ]
+
+    def query_many(self, entity_uris):
+        entity_uris = [URI.parse(entity_uri).short() for entity_uri in entity_uris]
+
+        properties = defaultdict(list)
+        for entity_uri, property_uri, literal_type, literal_value, number in self.index.select_in(
+            'SELECT entity, property, type, value, number FROM literals '
+            'WHERE entity IN ({keys}) ORDER BY rowid',
+            list(set(entity_uris))
+        ):
+            properties[entity_uri].append(make_literal(property_uri, literal_type, literal_value, number))
+
+        return [
+            properties.get(entity_uri, [])
+            for entity_uri in entity_uris
+        ]
+
 LiteralLinking.register_backend('csv', LiteralLinkingBackendCSV)
+LiteralLinking.register_backend('binary', LiteralLinkingBackendBinary)
+LiteralLinking.register_backend('sqlite', LiteralLinkingBackendSQLite)
@@ -1,3 +1,8 @@
+import io, os, gc, math, pickle, sqlite3
+from collections import Counter
+from urllib.request import pathname2url
+import Levenshtein
+
 class URI:
     prefix = {
         'dbpedia': 'http://dbpedia.org/page/',
@@ -46,3 +51,137 @@ class URI:
         return '{:s}{:s}'.format(
             URI.prefix[self.prefix], self.suffix
         )
+
+# Binary index files (see the backends' `build' methods) consist of a magic
+# string, the format name/version and the pickled index data structure. They
+# contain preprocessed mentions and parsed URIs and thus load much faster
+# than the TSV index files they are built from.
+binary_index_magic = b'WTUINDEX'
+
+def dump_binary_index(index, index_format, output_file):
+    with io.open(output_file, 'wb') as out_fh:
+        out_fh.write(binary_index_magic)
+        pickle.dump(index_format, out_fh, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(index, out_fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_binary_index(index_file, index_format):
+    with io.open(index_file, 'rb') as index_fh:
+        if index_fh.read(len(binary_index_magic)) != binary_index_magic:
+            raise Exception('"{:s}" is not a binary index file!'.format(index_file))
+
+        file_format = pickle.load(index_fh)
+        if file_format != index_format:
+            raise Exception('"{:s}" has index format "{:s}", expected "{:s}"!'.format(
+                index_file, file_format, index_format
+            ))
+
+        # the index consists of (many) small objects, none of which are
+        # garbage. Don't let the garbage collector scan them while loading.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return pickle.load(index_fh)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+# SQLite index files (see the `sqlite' backends' `build' methods) are queried
+# on disk, so they neither need to fit into memory nor to be loaded on start.
+# Their `meta' table records the index format/version.
+def create_sqlite_index(output_file, index_format):
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    conn = sqlite3.connect(output_file)
+    conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+    conn.execute('INSERT INTO meta VALUES (?, ?)', ('format', index_format))
+    return conn
+
+# read-only connection to an SQLite index file. Connections can't be shared
+# across `fork', so each (worker) process opens its own on first use.
+class SQLiteIndex:
+    def __init__(self, index_file, index_format):
+        self.index_file = index_file
+        self.conn = None
+        self.pid = None
+
+        file_format = self.connection().execute(
+            'SELECT value FROM meta WHERE key = ?', ('format',)
+        ).fetchone()[0]
+        if file_format != index_format:
+            raise Exception('"{:s}" has index format "{:s}", expected "{:s}"!'.format(
+                self.index_file, file_format, index_format
+            ))
+
+    def connection(self):
+        if self.pid != os.getpid():
+            if not os.path.exists(self.index_file):
+                raise Exception('SQLite index "{:s}" does not exist!'.format(self.index_file))
+            # the connection's statement cache keeps the queries prepared
+            # (the path is URL encoded, it may contain '?', '#' or '%')
+            self.conn = sqlite3.connect(
+                'file:{:s}?mode=ro'.format(pathname2url(os.path.abspath(self.index_file))),
+                uri=True, check_same_thread=False, cached_statements=16
+            )
+            self.pid = os.getpid()
+        return self.conn
+
+    # run `query' (containing `IN ({keys})') for chunks of `keys', yields the
+    # resulting rows. Chunks are padded to `chunk_size' keys (repeating the
+    # first one), so all chunks use the same prepared statement
+    def select_in(self, query, keys, chunk_size=256):
+        query = query.format(keys=', '.join(['?'] * chunk_size))
+        conn = self.connection()
+        for chunk_start in range(0, len(keys), chunk_size):
+            chunk = keys[chunk_start:chunk_start+chunk_size]
+            chunk += [chunk[0]] * (chunk_size - len(chunk))
+            yield from conn.execute(query, chunk)
+
+# Bounded string similarity
+#
+# Callers only care about Levenshtein similarities (1 - distance/max length)
+# of at least some cutoff, i.e. about distances up to a maximum. Pairs whose
+# lengths differ by more than that are rejected without computing the
+# distance. The Levenshtein module (0.18+, see requirements.txt) stops
+# computing the distance once it exceeds the maximum (`score_cutoff').
+# Older versions compute the full distance, after rejecting pairs whose
+# character histograms differ by more than the maximum.
+try:
+    Levenshtein.distance('', '', score_cutoff=0)
+    levenshtein_score_cutoff = True
+except TypeError:
+    levenshtein_score_cutoff = False
+
+# lower bound of the Levenshtein distance: each edit operation removes at
+# most one surplus character on either side
+def histogram_distance_bound(str_a, str_b):
+    surplus_a = sum((Counter(str_a) - Counter(str_b)).values())
+    surplus_b = surplus_a - len(str_a) + len(str_b)
+    return max(surplus_a, surplus_b)
+
+# Levenshtein distance of `str_a' and `str_b' if it is at most
+# `max_distance', otherwise some larger number
+def bounded_levenshtein_distance(str_a, str_b, max_distance):
+    if abs(len(str_a) - len(str_b)) > max_distance:
+        return max_distance + 1
+    if levenshtein_score_cutoff:
+        return Levenshtein.distance(str_a, str_b, score_cutoff=max_distance)
+
+    if histogram_distance_bound(str_a, str_b) > max_distance:
+        return max_distance + 1
+    return Levenshtein.distance(str_a, str_b)
+
+# maximum Levenshtein distance of strings of length `max_len' with a
+# similarity of at least `cutoff' (epsilon: float rounding)
+def max_levenshtein_distance(max_len, cutoff):
+    return math.floor((1 - cutoff) * max_len + 1e-9)
+
+# Levenshtein similarity (between 0 and 1) of `str_a' and `str_b' if it is
+# at least `cutoff', otherwise None
+def bounded_levenshtein_similarity(str_a, str_b, cutoff):
+    max_len = max(len(str_a), len(str_b))
+    edit_distance = bounded_levenshtein_distance(str_a, str_b, max_levenshtein_distance(max_len, cutoff))
+    similarity = 1 - edit_distance/max_len
+    if similarity >= cutoff:
+        return similarity
+    return None